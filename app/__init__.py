@@ -19,6 +19,11 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     login.init_app(app)
     
+    # Configure the market data source
+    from app.utils.market_data import set_provider
+    from app.utils.providers import create_provider
+    set_provider(create_provider(app.config['PRICE_PROVIDER']))
+    
     # Register main blueprint
     # Blueprint-Import in der Funktion, um zirkuläre Imports zu vermeiden
     from app.routes import main
@@ -48,9 +53,17 @@ def create_app(config_class=Config):
     from app.modules.wl_ticker import bp as wl_ticker_bp
     app.register_blueprint(wl_ticker_bp, url_prefix='/wl_ticker')
     
+    # Register CLI commands (flask prices warm)
+    from app.commands import prices_cli
+    app.cli.add_command(prices_cli)
+    
     # Create database tables - only needed for development
     with app.app_context():
         db.create_all()
+        
+        # Move portfolios still stored as JSON documents into the holding table
+        from app.utils.portfolio_utils import migrate_portfolio_holdings
+        migrate_portfolio_holdings()
     
     return app
 
@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import click
+from flask.cli import AppGroup
+from app.utils.fx import fx_tickers_for
+from app.utils.market_data import is_cache_fresh, refresh_tickers, get_provider, request_chunks, LOCK_TIMEOUT
+from app.utils.portfolio_utils import get_all_portfolio_tickers, get_all_portfolio_currencies
+from app.utils.price_store import get_price_store
+from app.utils.rate_limit import get_rate_limiter
+
+prices_cli = AppGroup('prices', help='Manage the market data price store.')
+
+
+def warm_chunk(ticker_symbols, force):
+    """Refresh a chunk of tickers in one grouped download, returns (ticker -> (status, header), seconds)"""
+    started = time.perf_counter()
+    results = {}
+    stale = []
+    for ticker_symbol in ticker_symbols:
+        if not force and is_cache_fresh(ticker_symbol):
+            results[ticker_symbol] = ('fresh', None)
+        else:
+            stale.append(ticker_symbol)
+    headers = refresh_tickers(stale, full=force) if stale else {}
+    for ticker_symbol in stale:
+        header = headers.get(ticker_symbol)
+        results[ticker_symbol] = ('ok' if header else 'failed', header)
+    return results, time.perf_counter() - started
+
+
+@prices_cli.command('warm')
+@click.option('--workers', default=4, show_default=True, help='Number of parallel fetch threads.')
+@click.option('--force', is_flag=True, help='Download the full history even if the cache is fresh.')
+def warm(workers, force):
+    """Prefetch prices for every ticker held in any portfolio and the FX rates they need (run from cron before market open)."""
+    tickers = get_all_portfolio_tickers() + fx_tickers_for(get_all_portfolio_currencies())
+    # One task per chunk the provider's request budget grants at once, so downloads stay grouped
+    chunks = request_chunks(get_provider(), tickers)
+    click.echo(f"Warming {len(tickers)} tickers in {len(chunks)} chunks with {workers} workers")
+
+    started = time.perf_counter()
+    counts = {'ok': 0, 'fresh': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(warm_chunk, chunk, force): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                results, seconds = future.result()
+            except Exception as e:
+                results, seconds = {ticker: ('failed', None) for ticker in chunk}, 0.0
+                click.echo(f"Error warming {', '.join(chunk)}: {e}")
+            for ticker in chunk:
+                status, header = results[ticker]
+                counts[status] += 1
+                detail = f"{header.last_close:.2f} ({header.last_date_str})" if header else ''
+                click.echo(f"{ticker:<12} {status:<6} {seconds:6.2f}s {detail}")
+
+    click.echo(f"Done in {time.perf_counter() - started:.2f}s: "
+               f"{counts['ok']} refreshed, {counts['fresh']} already fresh, {counts['failed']} failed")
+
+
+@prices_cli.command('limits')
+@click.option('--reset', is_flag=True, help='Reset the wait-time metrics after printing them.')
+def limits(reset):
+    """Show rate limiter wait-time metrics of all providers (shared by all workers)."""
+    limiter = get_rate_limiter()
+    metrics = limiter.metrics()
+    if not metrics:
+        click.echo("No rate limited requests recorded")
+    for name, values in metrics.items():
+        click.echo(f"{name:<12} acquired {values['acquired']:>6}  waited {values['waited']:>6}  "
+                   f"avg {values['avg_wait']:.3f}s  max {values['max_wait']:.3f}s  "
+                   f"timeouts {values['timeouts']}  tokens left {values['tokens']}")
+    if reset:
+        limiter.reset_metrics()
+
+
+@prices_cli.command('delete')
+@click.argument('tickers', nargs=-1, required=True)
+def delete(tickers):
+    """Remove the stored prices and failure entries of tickers, they are fetched completely on next use."""
+    store = get_price_store()
+    for ticker in tickers:
+        # Not while a worker is writing the ticker
+        lock = store.lock(ticker)
+        if not lock.acquire(timeout=LOCK_TIMEOUT):
+            click.echo(f"{ticker:<12} skipped, a fetch is running")
+            continue
+        try:
+            store.delete(ticker)
+        finally:
+            lock.release()
+        click.echo(f"{ticker:<12} deleted")
@@ -3,6 +3,13 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
+import numpy as np
+
+# Fields the portfolio valuation computes per asset; they are never stored
+DERIVED_FIELDS = ('current_price', 'current_value', 'gain_loss', 'gain_loss_percent')
+
+# Asset classes of a portfolio, in display order
+HOLDING_CLASSES = ('etf', 'stocks', 'bonds', 'commodities', 'realEstate', 'savings')
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,6 +20,7 @@ class User(UserMixin, db.Model):
     
     # Relationships
     portfolio_data = db.relationship('PortfolioData', backref='user', lazy='dynamic')
+    holdings = db.relationship('Holding', backref='user', lazy='dynamic')
     cost_income_entries = db.relationship('CostIncomeEntry', backref='user', lazy='dynamic')
     
     def set_password(self, password):
@@ -25,18 +33,91 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 class PortfolioData(db.Model):
+    """A user's portfolio; the assets are Holding rows, updated_at changes with every edit"""
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    data = db.Column(db.Text)  # JSON data stored as text
+    data = db.Column(db.Text)  # legacy JSON document, moved to Holding rows on startup
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def get_data(self):
-        """Convert JSON string to Python dictionary"""
-        return json.loads(self.data)
+        """Holdings as a dict of asset class -> list of asset dicts"""
+        portfolio_dict = {asset_class: [] for asset_class in HOLDING_CLASSES}
+        holdings = Holding.query.filter_by(user_id=self.user_id).order_by(Holding.position, Holding.id)
+        for holding in holdings:
+            portfolio_dict.setdefault(holding.asset_class, []).append(holding.to_dict())
+        return portfolio_dict
     
     def set_data(self, portfolio_dict):
-        """Convert Python dictionary to JSON string"""
-        self.data = json.dumps(portfolio_dict)
+        """Replace all holdings with the assets of a portfolio dict"""
+        Holding.query.filter_by(user_id=self.user_id).delete()
+        for asset_class, assets in portfolio_dict.items():
+            for position, asset in enumerate(assets):
+                db.session.add(Holding.from_asset(self.user_id, asset_class, asset, position))
+        self.touch()
+    
+    def touch(self):
+        """Mark the holdings as changed, invalidates everything cached for them"""
+        self.updated_at = datetime.utcnow()
+        
+class Holding(db.Model):
+    """One asset of a user's portfolio"""
+    __tablename__ = 'holding'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    asset_class = db.Column(db.String(20), nullable=False)  # one of HOLDING_CLASSES
+    position = db.Column(db.Integer, default=0)  # order within the asset class
+    name = db.Column(db.String(200))
+    ticker = db.Column(db.String(20), index=True)
+    isin = db.Column(db.String(12))
+    currency = db.Column(db.String(3))
+    amount = db.Column(db.Float)
+    acquisition_cost = db.Column(db.Float)  # cost basis in the base currency
+    interest_rate = db.Column(db.Float)  # savings only, as a decimal
+    
+    # Optional asset fields, left out of the asset dict when not set
+    OPTIONAL_FIELDS = ('ticker', 'isin', 'currency', 'amount', 'acquisition_cost', 'interest_rate')
+    
+    @classmethod
+    def from_asset(cls, user_id, asset_class, asset, position=0):
+        """Create a holding from an asset dict (derived and unknown fields are ignored)"""
+        return cls(user_id=user_id, asset_class=asset_class, position=position,
+                   name=asset.get('name'), **{field: asset.get(field) for field in cls.OPTIONAL_FIELDS})
+    
+    def to_dict(self):
+        """Asset dict in the shape of the former JSON portfolio, with the holding id"""
+        asset = {'id': self.id, 'name': self.name}
+        for field in self.OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                asset[field] = value
+        return asset
+    
+    def __repr__(self):
+        return f'<Holding {self.asset_class} {self.ticker or self.name}>'
+        
+class PortfolioHistory(db.Model):
+    """Daily total value of a user's market-priced holdings in the base currency"""
+    __tablename__ = 'portfolio_history'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True, index=True)
+    base_currency = db.Column(db.String(3))
+    holdings_version = db.Column(db.String(40))  # hash of the positions and the rewrite times of their series
+    price_version = db.Column(db.String(40))  # hash of the price headers the series was computed from
+    dates = db.Column(db.LargeBinary)  # int32 epoch days
+    values = db.Column(db.LargeBinary)  # float64 total value per day
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def get_dates(self):
+        return np.frombuffer(self.dates or b'', dtype=np.int32)
+    
+    def get_values(self):
+        return np.frombuffer(self.values or b'', dtype=np.float64)
+    
+    def set_series(self, dates, values):
+        self.dates = np.ascontiguousarray(dates, dtype=np.int32).tobytes()
+        self.values = np.ascontiguousarray(values, dtype=np.float64).tobytes()
         self.updated_at = datetime.utcnow()
         
 class CostIncomeEntry(db.Model):
@@ -64,4 +145,44 @@ class WLTickerStation(db.Model):
     user = db.relationship('User', backref=db.backref('wl_stations', lazy=True))
     
     def __repr__(self):
-        return f'<WLTickerStation {self.station_name}>'
\ No newline at end of file
+        return f'<WLTickerStation {self.station_name}>'
+
+class RefreshJob(db.Model):
+    """Background market data refresh of a user's portfolio"""
+    __tablename__ = 'refresh_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(10), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    tickers = db.Column(db.Text)  # JSON list of tickers
+    progress = db.Column(db.Text)  # JSON dict ticker -> per-ticker result
+    error = db.Column(db.String(256))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def get_tickers(self):
+        return json.loads(self.tickers or '[]')
+    
+    def get_progress(self):
+        return json.loads(self.progress or '{}')
+    
+    def set_progress(self, progress_dict):
+        self.progress = json.dumps(progress_dict)
+    
+    def to_dict(self):
+        """Status summary for the polling endpoint"""
+        tickers = self.get_tickers()
+        progress = self.get_progress()
+        completed = sum(1 for entry in progress.values() if entry.get('status') in ('done', 'failed'))
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': len(tickers),
+            'completed': completed,
+            'tickers': {ticker: progress.get(ticker, {'status': 'pending'}) for ticker in tickers},
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
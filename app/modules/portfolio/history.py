@@ -0,0 +1,204 @@
+import hashlib
+import numpy as np
+from app import db
+from app.models import PortfolioData, PortfolioHistory
+from app.utils.alignment import align_columns
+from app.utils.downsample import lttb_indices
+from app.utils.fx import get_base_currency, fx_tickers_for, fx_rates_for_dates
+from app.utils.market_data import get_series_batch
+from app.utils.price_store import epoch_day_to_str
+
+# Asset classes valued with market prices, the others have no price history
+HISTORY_ASSET_CLASSES = ['etf', 'stocks']
+
+
+def version_hash(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def history_positions(portfolio_data, base_currency):
+    """Market-priced holdings as sorted (ticker, amount, currency) tuples"""
+    positions = []
+    for asset_class in HISTORY_ASSET_CLASSES:
+        for asset in portfolio_data.get(asset_class, []):
+            if asset.get('ticker') and asset.get('amount', 0) > 0:
+                positions.append((asset['ticker'], float(asset['amount']), asset.get('currency') or base_currency))
+    return sorted(positions)
+
+
+def position_values(positions, series_by_ticker, base_currency, start_day=None):
+    """Aligned (dates x positions) matrix of unit prices converted to the base currency.
+
+    Returns (dates, prices, quantities, tickers) for the positions that have
+    a price history and, in a foreign currency, an FX history; rows before
+    a position's first bar are NaN. With a
+    start_day every series starts one bar before it so gaps on the first
+    day are forward filled like the rest.
+    """
+    date_arrays = []
+    price_arrays = []
+    quantities = []
+    currencies = []
+    tickers = []
+    for ticker, amount, currency in positions:
+        series = series_by_ticker.get(ticker)
+        if series is None or len(series) == 0:
+            print(f"No price history for {ticker}, left out of the portfolio valuation")
+            continue
+        start = 0 if start_day is None else max(series.index_range(start_day)[0] - 1, 0)
+        date_arrays.append(series.dates[start:])
+        price_arrays.append(series.close[start:])
+        quantities.append(amount)
+        currencies.append(currency)
+        tickers.append(ticker)
+
+    dates, prices = align_columns(date_arrays, price_arrays)
+    # One FX column per currency, shared by all positions quoted in it
+    keep = np.ones(len(tickers), dtype=bool)
+    for currency in set(currencies):
+        columns = [i for i, item in enumerate(currencies) if item == currency]
+        rates = fx_rates_for_dates(currency, dates, base_currency)
+        if rates is None:
+            print(f"No FX history for {currency}, {', '.join(tickers[i] for i in columns)} left out of the portfolio valuation")
+            keep[columns] = False
+            continue
+        prices[:, columns] *= rates[:, None]
+    if not keep.all():
+        prices = prices[:, keep]
+        rows = ~np.isnan(prices).all(axis=1)
+        dates, prices = dates[rows], prices[rows]
+    return dates, prices, np.array(quantities)[keep], [ticker for ticker, kept in zip(tickers, keep) if kept]
+
+
+def compute_history(positions, series_by_ticker, base_currency, start_day=None):
+    """Total value per day of the positions, from start_day on (or the full history).
+
+    The converted prices of all positions are multiplied by the quantities
+    in one matrix product; before its first bar a position contributes
+    nothing.
+    """
+    dates, prices, quantities, _ = position_values(positions, series_by_ticker, base_currency, start_day)
+    if len(dates) == 0:
+        return dates, np.empty(0)
+    values = np.nan_to_num(prices) @ quantities
+
+    if start_day is not None:
+        keep = dates >= start_day
+        dates, values = dates[keep], values[keep]
+    return dates, values
+
+
+def series_versions(series_by_ticker):
+    """Availability and rewrite time of every series, read from the headers only.
+
+    Appending new trading days keeps the rewrite time, a full refetch (e.g.
+    re-adjusted prices after a failed overlap check, revised FX history)
+    changes it, as does a series that became available.
+    """
+    return [(ticker, series.header.rewrite_time if series is not None and len(series) else None)
+            for ticker, series in sorted(series_by_ticker.items())]
+
+
+def stored_version(holdings_version, series_by_ticker):
+    """holdings_version of a stored history: the positions and the stored days of all series"""
+    return version_hash(holdings_version, series_versions(series_by_ticker))
+
+
+def load_positions(user_id, portfolio_data=None, extra_tickers=()):
+    """Positions of a user with their price series, loaded in one batch.
+
+    Returns (positions, series_by_ticker, holdings_version, price_version)
+    or None if the portfolio has no priced holdings; extra_tickers (e.g. a
+    benchmark) are loaded along and part of the price version.
+    """
+    if portfolio_data is None:
+        portfolio = PortfolioData.query.filter_by(user_id=user_id).first()
+        if portfolio is None:
+            return None
+        portfolio_data = portfolio.get_data()
+
+    base_currency = get_base_currency()
+    positions = history_positions(portfolio_data, base_currency)
+    if not positions:
+        return None
+
+    tickers = sorted({ticker for ticker, _, _ in positions} | set(extra_tickers)) + \
+        fx_tickers_for([currency for _, _, currency in positions], base_currency)
+    series_by_ticker = get_series_batch(tickers)
+    holdings_version = version_hash(positions, base_currency)
+    price_version = version_hash([(ticker, series.header.fetch_time, len(series)) if series is not None else ticker
+                                  for ticker, series in series_by_ticker.items()])
+    return positions, series_by_ticker, holdings_version, price_version
+
+
+def update_history(user_id, portfolio_data=None):
+    """Bring the persisted value history of a user up to date.
+
+    Unchanged prices return the stored series as is, also an empty one.
+    Prices that were only appended recompute the last stored day and the
+    days after it. Changed holdings, a new base currency or a rewritten
+    series rebuild the full history. The stored holdings_version covers the
+    positions and the series versions, so the check only reads the price
+    headers. Returns the PortfolioHistory, or None if the portfolio has no
+    priced holdings.
+    """
+    loaded = load_positions(user_id, portfolio_data)
+    if loaded is None:
+        return None
+    positions, series_by_ticker, holdings_version, price_version = loaded
+    base_currency = get_base_currency()
+
+    history = PortfolioHistory.query.filter_by(user_id=user_id).first()
+    stored_dates = history.get_dates() if history is not None else np.empty(0, dtype=np.int32)
+    version = stored_version(holdings_version, series_by_ticker)
+    intact = history is not None and history.holdings_version == version
+    if intact and history.price_version == price_version:
+        return history
+
+    if not intact or len(stored_dates) == 0:
+        dates, values = compute_history(positions, series_by_ticker, base_currency)
+    else:
+        last_day = int(stored_dates[-1])
+        new_dates, new_values = compute_history(positions, series_by_ticker, base_currency, start_day=last_day)
+        keep = stored_dates < last_day
+        dates = np.concatenate([stored_dates[keep], new_dates])
+        values = np.concatenate([history.get_values()[keep], new_values])
+
+    if history is None:
+        history = PortfolioHistory(user_id=user_id)
+        db.session.add(history)
+    history.base_currency = base_currency
+    history.holdings_version = version
+    history.price_version = price_version
+    history.set_series(dates, values)
+    db.session.commit()
+    return history
+
+
+def history_cache_entry(user_id, max_points):
+    """Update the stored history and return (group, version, key, history) for the /history ETag.
+
+    Raises LookupError if the portfolio has no priced holdings.
+    """
+    history = update_history(user_id)
+    if history is None:
+        raise LookupError("Keine Wertpapiere mit Kursdaten im Portfolio")
+    return user_id, (history.holdings_version, history.price_version), (max_points,), history
+
+
+def history_payload(max_points, history):
+    """The stored value series, reduced to max_points with LTTB if given"""
+    dates = history.get_dates()
+    values = history.get_values()
+    total_points = len(dates)
+    if max_points is not None and len(dates) > max_points:
+        keep = lttb_indices(dates, values, max_points)
+        dates, values = dates[keep], values[keep]
+    return {
+        'dates': dates,
+        'values': values,
+        'base_currency': history.base_currency,
+        'last_date': epoch_day_to_str(dates[-1]) if len(dates) else None,
+        'downsampled': len(dates) < total_points,
+        'total_points': total_points
+    }
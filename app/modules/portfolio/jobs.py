@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import RefreshJob
+from app.modules.portfolio.history import update_history
+from app.utils.market_data import refresh_tickers, get_fetch_error
+
+# Tickers refreshed per batch, the job progress is stored after every batch
+JOB_BATCH_SIZE = 10
+
+# Running jobs older than this are considered lost (worker killed by a timeout, restart or OOM)
+JOB_TIMEOUT = timedelta(minutes=15)
+
+_runner_lock = threading.Lock()
+_runner_thread = None
+_runner_pid = None
+
+
+def enqueue_refresh(user_id, tickers):
+    """Queue a background refresh of the given tickers and return the job"""
+    job = RefreshJob(id=uuid.uuid4().hex, user_id=user_id, status='queued', tickers=json.dumps(tickers))
+    job.set_progress({})
+    db.session.add(job)
+    db.session.commit()
+
+    start_runner(current_app._get_current_object())
+    return job
+
+
+def start_runner(app):
+    """Start the job runner thread of this worker if it is not running"""
+    global _runner_thread, _runner_pid
+    with _runner_lock:
+        # Threads do not survive gunicorn's fork
+        if _runner_pid != os.getpid():
+            _runner_thread = None
+            _runner_pid = os.getpid()
+        if _runner_thread is None:
+            _runner_thread = threading.Thread(target=run_jobs, args=(app,), name='refresh-jobs', daemon=True)
+            _runner_thread.start()
+
+
+def is_stale(job, now=None):
+    """Check if a running job has exceeded JOB_TIMEOUT"""
+    return (job.status == 'running' and job.started_at is not None and
+            (now or datetime.utcnow()) - job.started_at > JOB_TIMEOUT)
+
+
+def fail_stale_jobs():
+    """Mark running jobs whose worker died as failed, returns their number.
+
+    They are not requeued: a job that killed its worker would do so again.
+    """
+    now = datetime.utcnow()
+    failed = RefreshJob.query.filter(RefreshJob.status == 'running',
+                                     RefreshJob.started_at < now - JOB_TIMEOUT).update(
+        {'status': 'failed', 'error': 'Abgebrochen: Zeitüberschreitung', 'finished_at': now},
+        synchronize_session=False)
+    db.session.commit()
+    return failed
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running, returns None if there is none"""
+    fail_stale_jobs()
+    while True:
+        job = RefreshJob.query.filter_by(status='queued').order_by(RefreshJob.created_at).first()
+        if job is None:
+            return None
+        # Another worker may claim the same job, only one UPDATE matches
+        claimed = RefreshJob.query.filter_by(id=job.id, status='queued').update(
+            {'status': 'running', 'started_at': datetime.utcnow()})
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            return job
+
+
+def run_jobs(app):
+    """Runner thread: process queued jobs until the queue is empty"""
+    global _runner_thread
+    with app.app_context():
+        try:
+            while True:
+                with _runner_lock:
+                    job = claim_next_job()
+                    if job is None:
+                        _runner_thread = None
+                        return
+                run_job(job)
+        finally:
+            db.session.remove()
+
+
+def run_job(job):
+    """Refresh the job's tickers batch by batch and record per-ticker progress"""
+    tickers = job.get_tickers()
+    progress = job.get_progress()
+    try:
+        for i in range(0, len(tickers), JOB_BATCH_SIZE):
+            batch = tickers[i:i + JOB_BATCH_SIZE]
+            headers = refresh_tickers(batch)
+            for ticker in batch:
+                header = headers.get(ticker)
+                if header is not None:
+                    progress[ticker] = {
+                        'status': 'done',
+                        'last_close': round(header.last_close, 4),
+                        'last_date': header.last_date_str
+                    }
+                else:
+                    progress[ticker] = {
+                        'status': 'failed',
+                        'error': get_fetch_error(ticker) or 'Keine neuen Daten'
+                    }
+            job.set_progress(progress)
+            db.session.commit()
+        job.status = 'done'
+        # Extend the stored value history by the days just fetched
+        update_history(job.user_id)
+    except Exception as e:
+        print(f"Error in refresh job {job.id}: {e}")
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e)[:256]
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
@@ -0,0 +1,121 @@
+from datetime import date
+import numpy as np
+from flask import current_app
+from app.models import PortfolioData
+from app.modules.portfolio.history import load_positions, position_values, version_hash
+from app.modules.portfolio.risk import portfolio_returns
+from app.utils.fx import get_base_currency, get_fx_rates
+from app.utils.projection import METHODS, PERCENTILES, monthly_log_returns, simulate, compound
+from app.utils.result_cache import ResultCache
+
+# Memory bound for the serialized /projection responses kept per worker
+PROJECTION_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+# Limits of the request parameters
+MAX_YEARS = 40
+MIN_PATHS = 1000
+MAX_PATHS = 50000
+DEFAULT_PATHS = 10000
+
+# Historical monthly returns needed for a projection
+MIN_HISTORY_MONTHS = 12
+
+projection_cache = ResultCache(PROJECTION_CACHE_MAX_BYTES)
+
+
+def parse_projection_params(args):
+    """Validate the /projection request parameters, returns a dict with defaults filled in"""
+    try:
+        params = {
+            'years': int(args.get('years') or 10),
+            'paths': int(args.get('paths') or DEFAULT_PATHS),
+            'contribution': float(args.get('contribution') or 0.0),
+            'method': args.get('method') or 'bootstrap',
+            'seed': int(args.get('seed') or 0)
+        }
+    except ValueError:
+        raise ValueError("years, paths, contribution und seed müssen Zahlen sein")
+    if not 1 <= params['years'] <= MAX_YEARS:
+        raise ValueError(f"years muss zwischen 1 und {MAX_YEARS} liegen")
+    if not MIN_PATHS <= params['paths'] <= MAX_PATHS:
+        raise ValueError(f"paths muss zwischen {MIN_PATHS} und {MAX_PATHS} liegen")
+    if params['contribution'] < 0:
+        raise ValueError("contribution darf nicht negativ sein")
+    if params['method'] not in METHODS:
+        raise ValueError(f"Unbekannte Methode: {params['method']}")
+    return params
+
+
+def savings_accounts(portfolio_data):
+    """Savings balances as (amount, currency, annual interest rate) tuples"""
+    return [(float(savings.get('amount') or 0), savings.get('currency'), float(savings.get('interest_rate') or 0))
+            for savings in portfolio_data.get('savings', []) if savings.get('amount')]
+
+
+def projection_cache_entry(user_id, params):
+    """Load the positions and return (group, version, key, loaded, savings) for the projection cache.
+
+    The version covers the holdings, the savings, every price series used
+    and the current day. Raises LookupError if there is nothing to project.
+    """
+    portfolio = PortfolioData.query.filter_by(user_id=user_id).first()
+    portfolio_data = portfolio.get_data() if portfolio is not None else {}
+    loaded = load_positions(user_id, portfolio_data)
+    if loaded is None:
+        raise LookupError("Keine Wertpapiere mit Kursdaten im Portfolio")
+    savings = savings_accounts(portfolio_data)
+    _, _, holdings_version, price_version = loaded
+    version = (holdings_version, price_version, version_hash(savings), date.today())
+    key = (params['years'], params['paths'], params['contribution'], params['method'], params['seed'])
+    return user_id, version, key, loaded, savings
+
+
+def compute_projection(params, loaded, savings):
+    """Project the portfolio value over the horizon in monthly steps.
+
+    Securities follow simulated paths whose monthly returns come from the
+    portfolio's own history (current holdings, in the base currency);
+    contributions are invested in them. Savings compound at their interest
+    rate and are added to every path.
+    """
+    positions, series_by_ticker, _, _ = loaded
+    base_currency = get_base_currency()
+    dates, prices, quantities, _ = position_values(positions, series_by_ticker, base_currency)
+    samples = monthly_log_returns(portfolio_returns(prices, quantities))
+    if len(samples) < MIN_HISTORY_MONTHS:
+        raise ValueError("Zu wenige Kursdaten für eine Projektion")
+    start_value = float(np.nan_to_num(prices[-1]) @ quantities)
+
+    months = params['years'] * 12
+    bands, final_values = simulate(samples, params['method'], months, start_value, params['contribution'],
+                                   params['paths'], params['seed'],
+                                   current_app.config.get('PROJECTION_WORKERS', 1))
+
+    # Sparguthaben verzinsen sich deterministisch und verschieben alle Pfade gleich
+    rates = get_fx_rates([currency for _, currency, _ in savings], base_currency)
+    savings_values = np.zeros(months + 1)
+    for amount, currency, interest_rate in savings:
+        if np.isnan(rates[currency]):
+            print(f"No FX rate for {currency}, savings account left out of the projection")
+            continue
+        savings_values += compound(amount * rates[currency], interest_rate, months)
+
+    invested = start_value + params['contribution'] * np.arange(months + 1)
+    start_month = np.datetime64(date.today(), 'M')
+    return {
+        'months': [str(month) for month in start_month + np.arange(months + 1)],
+        'percentiles': list(PERCENTILES),
+        'bands': {f'p{percentile}': band + savings_values for percentile, band in zip(PERCENTILES, bands)},
+        'securities_bands': {f'p{percentile}': band for percentile, band in zip(PERCENTILES, bands)},
+        'savings': savings_values,
+        'invested': invested + savings_values[0],
+        'start_value': start_value + savings_values[0],
+        'final_median': float(np.median(final_values) + savings_values[-1]),
+        'final_mean': float(final_values.mean() + savings_values[-1]),
+        'probability_below_invested': float((final_values < invested[-1]).mean()),
+        'expected_annual_return': float(samples.mean() * 12),
+        'annual_volatility': float(samples.std(ddof=1) * np.sqrt(12)),
+        'history_start': str(np.datetime64(int(dates[0]), 'D')),
+        'base_currency': base_currency,
+        **params
+    }
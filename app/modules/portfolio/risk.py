@@ -0,0 +1,160 @@
+from datetime import date
+import numpy as np
+from flask import current_app
+from app.modules.portfolio.history import load_positions, position_values
+from app.utils.fx import get_base_currency
+from app.utils.price_store import epoch_day_to_str
+from app.utils.result_cache import ResultCache
+from app.utils.risk import (DEFAULT_BETA_WINDOW, MIN_BETA_WINDOW, MAX_BETA_WINDOW, log_return_matrix,
+                            annualized_volatility, annualized_return, sharpe_ratio, sortino_ratio,
+                            max_drawdown, rolling_beta, correlation_matrix)
+
+# Memory bound for the serialized /risk responses kept per worker
+RISK_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Kalendertage pro Zeitraum, 'all' umfasst die gesamte Historie
+RISK_TIMEFRAME_DAYS = {'1y': 365, '3y': 1095, '5y': 1826, '10y': 3652}
+
+risk_cache = ResultCache(RISK_CACHE_MAX_BYTES)
+
+
+def parse_risk_params(args):
+    """Validate the /risk request parameters, returns a dict with defaults filled in"""
+    params = {
+        'benchmark': (args.get('benchmark') or current_app.config.get('RISK_BENCHMARK', 'EUNL.DE')).strip(),
+        'timeframe': args.get('timeframe') or 'all',
+        'window': DEFAULT_BETA_WINDOW,
+        'risk_free_rate': current_app.config.get('RISK_FREE_RATE', 0.0)
+    }
+    if params['timeframe'] != 'all' and params['timeframe'] not in RISK_TIMEFRAME_DAYS:
+        raise ValueError(f"Ungültiger Zeitraum: {params['timeframe']}")
+    try:
+        if args.get('window'):
+            params['window'] = int(args['window'])
+        if args.get('risk_free_rate'):
+            params['risk_free_rate'] = float(args['risk_free_rate'])
+    except ValueError:
+        raise ValueError("window und risk_free_rate müssen Zahlen sein")
+    if not MIN_BETA_WINDOW <= params['window'] <= MAX_BETA_WINDOW:
+        raise ValueError(f"window muss zwischen {MIN_BETA_WINDOW} und {MAX_BETA_WINDOW} liegen")
+    if not -0.1 <= params['risk_free_rate'] <= 0.2:
+        raise ValueError("risk_free_rate muss ein Jahreszins zwischen -0.1 und 0.2 sein")
+    return params
+
+
+def risk_cache_entry(user_id, params):
+    """Load the positions and return (group, version, key, loaded) for the risk cache.
+
+    The version covers the holdings, every price series used (including
+    the benchmark) and the current day. Raises LookupError without priced
+    holdings.
+    """
+    loaded = load_positions(user_id, extra_tickers=[params['benchmark']])
+    if loaded is None:
+        raise LookupError("Keine Wertpapiere mit Kursdaten im Portfolio")
+    _, _, holdings_version, price_version = loaded
+    key = (params['benchmark'], params['timeframe'], params['window'], params['risk_free_rate'])
+    return user_id, (holdings_version, price_version, date.today()), key, loaded
+
+
+def portfolio_returns(prices, quantities):
+    """Daily log returns of the portfolio value, counting only positions priced on the previous day.
+
+    A position that starts trading later joins from its second day on, so
+    its entry does not show up as a jump in the portfolio return.
+    """
+    valid = ~np.isnan(prices)
+    held = np.nan_to_num(prices)
+    returns = np.full(len(prices), np.nan)
+    if len(prices) < 2:
+        return returns
+    previous = (held[:-1] * valid[:-1]) @ quantities
+    current = (held[1:] * valid[:-1] * valid[1:]) @ quantities
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = np.where(previous > 0, np.log(current / previous), np.nan)
+    return returns
+
+
+def align_benchmark(series, dates):
+    """Benchmark closes at the given epoch days (last close on or before each day, NaN before the first)"""
+    if series is None or len(series) == 0:
+        return np.full(len(dates), np.nan)
+    positions = np.searchsorted(series.dates, dates, side='right') - 1
+    closes = series.close[np.clip(positions, 0, len(series) - 1)]
+    return np.where(positions >= 0, closes, np.nan)
+
+
+def compute_risk(params, loaded):
+    """Risk metrics of every holding and the whole portfolio from the aligned price matrix.
+
+    All holdings plus the portfolio are one column each of a log-return
+    matrix, so every metric is computed for all of them in one pass.
+    """
+    positions, series_by_ticker, _, _ = loaded
+    base_currency = get_base_currency()
+    dates, prices, quantities, tickers = position_values(positions, series_by_ticker, base_currency)
+    if len(dates) < 2:
+        raise ValueError("Zu wenige Kursdaten für eine Risikoanalyse")
+
+    returns = np.column_stack([log_return_matrix(prices), portfolio_returns(prices, quantities)])
+    benchmark = align_benchmark(series_by_ticker.get(params['benchmark']), dates)
+    benchmark_returns = log_return_matrix(benchmark[:, None])[:, 0]
+
+    # Zeitraum auf Zeilen abbilden, der Portfolio-Index wird aus den Renditen verkettet
+    end_day = int(dates[-1])
+    if params['timeframe'] in RISK_TIMEFRAME_DAYS:
+        start_row = int(np.searchsorted(dates, end_day - RISK_TIMEFRAME_DAYS[params['timeframe']]))
+    else:
+        start_row = 0
+    dates = dates[start_row:]
+    returns = returns[start_row:]
+    returns[0] = np.nan
+    benchmark_returns = benchmark_returns[start_row:]
+    portfolio_index = np.exp(np.nancumsum(returns[:, -1]))
+    levels = np.column_stack([prices[start_row:], portfolio_index])
+
+    rate = params['risk_free_rate']
+    volatility = annualized_volatility(returns)
+    mean_return = annualized_return(returns)
+    sharpe = sharpe_ratio(returns, rate)
+    sortino = sortino_ratio(returns, rate)
+    drawdown, peak_rows, trough_rows = max_drawdown(levels)
+    betas = rolling_beta(returns, benchmark_returns, params['window'])
+
+    def day(row):
+        return epoch_day_to_str(dates[row]) if row >= 0 else None
+
+    metrics = {
+        'volatility': volatility,
+        'return': mean_return,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'max_drawdown': drawdown,
+        'beta': betas[-1]
+    }
+    result = {
+        'tickers': tickers,
+        'holdings': {name: values[:-1] for name, values in metrics.items()},
+        'portfolio': {name: float(values[-1]) for name, values in metrics.items()},
+        'correlation': correlation_matrix(returns[:, :-1]),
+        'dates': dates,
+        'rolling_beta': betas[:, -1],
+        'base_currency': base_currency,
+        'benchmark': params['benchmark'],
+        'window': params['window'],
+        'risk_free_rate': rate,
+        'timeframe': params['timeframe'],
+        'start_date': epoch_day_to_str(dates[0]),
+        'end_date': epoch_day_to_str(end_day)
+    }
+    result['holdings']['drawdown_peak'] = [day(row) for row in peak_rows[:-1]]
+    result['holdings']['drawdown_trough'] = [day(row) for row in trough_rows[:-1]]
+    result['portfolio']['drawdown_peak'] = day(peak_rows[-1])
+    result['portfolio']['drawdown_trough'] = day(trough_rows[-1])
+    # NaN is not valid JSON, scalar metrics without enough data become None
+    for name, value in result['portfolio'].items():
+        if isinstance(value, float) and value != value:
+            result['portfolio'][name] = None
+    if np.isnan(benchmark_returns).all():
+        result['benchmark_error'] = f"Keine Kursdaten für Benchmark {params['benchmark']}"
+    return result
@@ -1,31 +1,61 @@
 from flask import render_template, jsonify, request
 from flask_login import login_required, current_user
-from app.modules.timeseries.views import get_timeseries_data, process_timeseries, get_available_securities
+from app.modules.timeseries.views import (get_timeseries_data, process_timeseries, process_comparison,
+                                          get_available_securities, analysis_cache, analysis_cache_entry,
+                                          comparison_cache_entry, data_cache_entry, get_holdings_version,
+                                          parse_analysis_params, parse_comparison_params)
 from app.modules.timeseries import bp
+from app.utils.http_cache import make_etag, not_modified, set_cache_headers, cached_response
+from app.utils.indicators import INDICATORS
 
 @bp.route('/')
 @login_required
 def index():
     # Alle verfügbaren Wertpapiere abrufen
     securities = get_available_securities()
-    return render_template('timeseries/index.html', securities=securities)
+    return render_template('timeseries/index.html', securities=securities, indicators=INDICATORS.values())
 
 @bp.route('/data')
 @login_required
 def data():
-    # Ticker-Symbol aus der Anfrage extrahieren
-    ticker = request.args.get('ticker', 'EUNL.DE')
-    return jsonify(get_timeseries_data(ticker))
+    # Unveränderte Daten nur per Version prüfen, ohne sie zu laden
+    return cached_response(lambda: request.args.get('ticker', 'EUNL.DE'), data_cache_entry,
+                           get_timeseries_data)
 
-@bp.route('/analyze', methods=['POST'])
+# Parameters of /analyze, further query arguments of a GET are indicator parameters
+ANALYZE_ARGS = {'ticker', 'timeframe', 'indicator', 'start', 'end', 'max_points', 'format'}
+
+@bp.route('/analyze', methods=['GET', 'POST'])
 @login_required
 def analyze():
-    params = request.json
-    results = process_timeseries(params)
-    return jsonify(results)
+    if request.method == 'POST':
+        params = request.json or {}
+    else:
+        params = request.args.to_dict()
+        params['params'] = {key: value for key, value in params.items() if key not in ANALYZE_ARGS}
+    
+    # Serialized results are reused until prices or holdings change
+    return cached_response(lambda: parse_analysis_params(params), analysis_cache_entry, process_timeseries, analysis_cache,
+                           requested=params.get('format'))
+
+@bp.route('/compare', methods=['GET', 'POST'])
+@login_required
+def compare():
+    # Mehrere Ticker als Matrix auf gemeinsamen Handelstagen, normiert auf 100
+    if request.method == 'POST':
+        params = request.json or {}
+    else:
+        params = request.args.to_dict()
+        params['tickers'] = request.args.getlist('ticker') or params.get('tickers')
+    return cached_response(lambda: parse_comparison_params(params), comparison_cache_entry, process_comparison, analysis_cache,
+                           requested=params.get('format'))
 
 @bp.route('/securities')
 @login_required
 def securities():
     # API-Endpunkt, um die Liste der Wertpapiere als JSON zurückzugeben
-    return jsonify(get_available_securities())
\ No newline at end of file
+    etag = make_etag(current_user.id, get_holdings_version())
+    response = not_modified(etag)
+    if response is None:
+        response = jsonify(get_available_securities())
+    return set_cache_headers(response, etag)
@@ -1,60 +1,29 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import json
-import os
-import time
-import random
-from datetime import datetime, timedelta
-from flask import current_app
+from datetime import date
 from flask_login import current_user
+from app import db
 from app.models import PortfolioData
+from app.utils.alignment import align_columns, normalize_columns
+from app.utils.fx import get_base_currency, convert_series
+from app.utils.downsample import lttb_indices, parse_max_points
+from app.utils.indicators import compute_indicator, get_indicator, select_values
+from app.utils.market_data import (get_series, get_series_batch, get_fetch_error, is_refreshing,
+                                   get_price_header, get_price_headers)
+from app.utils.price_store import date_to_epoch_day, epoch_day_to_str
+from app.utils.result_cache import ResultCache
+from app.utils.valuation import get_valuation
 
-# Create a simple file-based cache system
-CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'cache')
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+# Memory bound for the serialized /analyze responses kept per worker
+ANALYSIS_CACHE_MAX_BYTES = 64 * 1024 * 1024
 
-def get_cached_data(ticker):
-    """Get cached data for a ticker if it exists and is fresh"""
-    cache_file = os.path.join(CACHE_DIR, f"{ticker.replace('/', '_').replace(':', '_')}.json")
-    
-    if not os.path.exists(cache_file):
-        return None
-        
-    # Check if data is stale (older than 6 hours)
-    file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-    time_diff = datetime.now() - file_time
-    if time_diff > timedelta(hours=6):
-        return None
-        
-    try:
-        with open(cache_file, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error reading cache file for {ticker}: {e}")
-        return None
+# Kalendertage pro Zeitraum, 'all' umfasst die gesamte Historie
+TIMEFRAME_DAYS = {'1m': 30, '3m': 90, '6m': 180, '1y': 365}
 
-def update_cache(ticker, data):
-    """Update the cache for a ticker"""
-    cache_file = os.path.join(CACHE_DIR, f"{ticker.replace('/', '_').replace(':', '_')}.json")
-    
-    try:
-        with open(cache_file, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Error writing cache file for {ticker}: {e}")
+# Maximale Anzahl Ticker pro /compare-Anfrage
+MAX_COMPARE_TICKERS = 10
 
-def is_cache_fresh(ticker):
-    """Check if the cache for a ticker is fresh (updated within the last 6 hours)"""
-    cache_file = os.path.join(CACHE_DIR, f"{ticker.replace('/', '_').replace(':', '_')}.json")
-    
-    if not os.path.exists(cache_file):
-        return False
-        
-    file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-    time_diff = datetime.now() - file_time
-    return time_diff <= timedelta(hours=6)
+analysis_cache = ResultCache(ANALYSIS_CACHE_MAX_BYTES)
 
 def get_available_securities():
     """Retrieves the portfolio data for the current user"""
@@ -223,205 +192,107 @@ def get_demo_portfolio_data():
     }
 
 def fetch_ticker_data_safely(ticker_symbol):
-    """Fetch ticker data with cache and rate limit protection"""
-    # Try to get data from cache first
-    cached_data = get_cached_data(ticker_symbol)
-    if cached_data:
-        print(f"Using cached data for {ticker_symbol}")
-        return cached_data
+    """Fetch ticker data from the price store, refreshing it if stale.
     
-    # If data not in cache, need to fetch from API
-    print(f"Fetching fresh data for {ticker_symbol}")
+    If the upstream fetch fails the last good series is served; without one
+    an empty result with the error is returned, never synthetic data.
+    """
+    series = get_series(ticker_symbol)
+    error = get_fetch_error(ticker_symbol)
     
-    # Add random delay to avoid rate limiting
-    time.sleep(random.uniform(1.0, 3.0))
-    
-    try:
-        # Create Ticker object and fetch history
-        ticker = yf.Ticker(ticker_symbol)
-        historical_data = ticker.history(period="max")
-        
-        if historical_data.empty:
-            raise ValueError(f"Keine Daten für Ticker {ticker_symbol} gefunden")
-            
-        # Process the data for storage/return
-        historical_data.reset_index(inplace=True)
-        
-        # Convert to digestible format
-        result = {
+    if series is None or len(series) == 0:
+        return {
             'ticker': ticker_symbol,
-            'dates': historical_data["Date"].dt.strftime('%Y-%m-%d').tolist(),
-            'values': [float(val) for val in historical_data["Close"].tolist()],
-            'last_close': float(historical_data["Close"].iloc[-1]) if not historical_data.empty else 0,
-            'last_date': historical_data["Date"].iloc[-1].strftime('%Y-%m-%d') if not historical_data.empty else "Unknown",
-            'fetch_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'full_history': True
+            'dates': np.empty(0, dtype=np.int64),
+            'values': np.empty(0),
+            'full_history': False,
+            'error': error or f"Keine Daten für Ticker {ticker_symbol} gefunden"
         }
-        
-        # Save additional data if available
-        if not historical_data.empty:
-            if 'Open' in historical_data.columns:
-                result['open_values'] = [float(val) for val in historical_data["Open"].tolist()]
-            if 'High' in historical_data.columns:
-                result['high_values'] = [float(val) for val in historical_data["High"].tolist()]
-            if 'Low' in historical_data.columns:
-                result['low_values'] = [float(val) for val in historical_data["Low"].tolist()]
-            if 'Volume' in historical_data.columns:
-                result['volume_values'] = [float(val) if not pd.isna(val) else 0 for val in historical_data["Volume"].tolist()]
-        
-        # Add full datetime if available
-        if 'Datetime' in historical_data.columns and not historical_data.empty:
-            result['last_datetime'] = historical_data["Datetime"].iloc[-1].strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            # Default to date with standard closing time
-            result['last_datetime'] = f"{result['last_date']} 17:30:00"
-        
-        # Cache the data for future use
-        update_cache(ticker_symbol, result)
-        
-        return result
     
-    except Exception as e:
-        print(f"Error fetching data from API for {ticker_symbol}: {e}")
-        
-        # Create fallback data with dummy values
-        current_datetime = datetime.now()
-        dates = [(current_datetime - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(365, 0, -1)]
-        close_values = [100 + (i % 20) + (i // 20) for i in range(365)]  # Generate some pattern
-        
-        fallback_data = {
-            'ticker': ticker_symbol,
-            'dates': dates,
-            'values': close_values,
-            'last_close': close_values[-1],
-            'last_date': dates[-1],
-            'last_datetime': f"{dates[-1]} 17:30:00",
-            'fetch_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'full_history': True,
-            'error': str(e),
-            'is_fallback': True
-        }
-        
-        # Add more realistic OHLC data
-        open_values = [val * (1 - random.uniform(-0.01, 0.01)) for val in close_values]
-        high_values = [max(o, c) * (1 + random.uniform(0, 0.02)) for o, c in zip(open_values, close_values)]
-        low_values = [min(o, c) * (1 - random.uniform(0, 0.02)) for o, c in zip(open_values, close_values)]
-        volume_values = [random.randint(10000, 1000000) for _ in range(365)]
-        
-        fallback_data['open_values'] = open_values
-        fallback_data['high_values'] = high_values
-        fallback_data['low_values'] = low_values
-        fallback_data['volume_values'] = volume_values
-        
-        # Cache the fallback data too, but with shorter expiry
-        update_cache(ticker_symbol, fallback_data)
-        
-        return fallback_data
+    result = series.to_dict()
+    # Stale data is served while a background refresh is running
+    result['refreshing'] = is_refreshing(ticker_symbol)
+    if error:
+        # Last known good data, the latest fetch failed
+        result['error'] = error
+    return result
 
 def get_timeseries_data(ticker_symbol=None):
     """Ruft Zeitreihendaten für das angegebene Ticker-Symbol ab mit Caching."""
     if ticker_symbol is None:
         ticker_symbol = "EUNL.DE"  # Standard-Ticker, falls keiner angegeben
     
-    try:
-        # Get ticker data with caching and rate limit protection
-        ticker_data = fetch_ticker_data_safely(ticker_symbol)
-        
-        # Verify that we have full timeseries data
-        if not ticker_data.get('full_history', False) or not ticker_data.get('dates') or not ticker_data.get('values'):
-            print(f"Cache for {ticker_symbol} does not contain full history data. Refreshing...")
-            
-            # Force a refresh of the data
-            cache_file = os.path.join(CACHE_DIR, f"{ticker_symbol.replace('/', '_').replace(':', '_')}.json")
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
-                
-            # Add a delay to avoid rate limiting
-            time.sleep(random.uniform(0.5, 2.0))
-                
-            # Fetch fresh data with full history
-            ticker_data = fetch_ticker_data_safely(ticker_symbol)
-        
-        # Get portfolio-specific information
-        return update_with_portfolio_info(ticker_data, ticker_symbol)
-        
-    except Exception as e:
-        print(f"Fehler beim Abrufen der Daten für {ticker_symbol}: {e}")
-        # Fallback mit Dummy-Daten
-        current_datetime = datetime.now()
-        dummy_dates = [(current_datetime - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(365, 0, -1)]
-        dummy_values = [100 + (i % 20) + (i // 20) for i in range(365)]  # Generate some pattern
-        
-        return {
-            'ticker': ticker_symbol,
-            'dates': dummy_dates,
-            'values': dummy_values,
-            'last_close': dummy_values[-1],
-            'last_date': dummy_dates[-1],
-            'last_datetime': f"{dummy_dates[-1]} 17:30:00",
-            'fetch_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'full_history': True,
-            'error': str(e),
-            'is_fallback': True
-        }
+    # Get ticker data with caching and rate limit protection
+    ticker_data = fetch_ticker_data_safely(ticker_symbol)
+    
+    # Get portfolio-specific information
+    return update_with_portfolio_info(ticker_data, ticker_symbol)
+
+def find_security(ticker_symbol):
+    """Find the holding of a ticker in the current user's portfolio.
+    
+    Returns (asset, holding) where holding is the ticker's row of the
+    request's portfolio valuation (price, FX rate, market value), or
+    (None, None) if the ticker is not held.
+    """
+    user_id = current_user.id if current_user.is_authenticated else None
+    valuation = get_valuation(get_portfolio_data, user_id, get_holdings_version())
+    holding = valuation['holdings'].get(ticker_symbol)
+    if holding is not None:
+        for asset in valuation['portfolio'].get(holding['asset_class'], []):
+            if asset.get('ticker') == ticker_symbol:
+                return asset, holding
+    return None, None
+
+def holding_info(security_info, holding, dates, close):
+    """Portfolio values of a holding for the closes at the given epoch days.
+    
+    The current value comes from the portfolio valuation; for the series
+    prices are converted to the base currency with the FX rate of each
+    day. Earnings and performance arrays are only added if an acquisition
+    cost is known.
+    """
+    base_currency = get_base_currency()
+    currency = security_info.get('currency', 'EUR')
+    amount = security_info.get('amount', 0)
+    acquisition_cost = security_info.get('acquisition_cost', 0)
+    info = {
+        'name': security_info.get('name', ''),
+        'currency': currency,
+        'base_currency': base_currency,
+        'isin': security_info.get('isin', ''),
+        'amount': amount,
+        'acquisition_cost': acquisition_cost
+    }
+    # Without an FX rate the holding has no value in the base currency
+    if holding['market_value'] is None:
+        return info
+    info['current_value'] = holding['market_value']
+    
+    if acquisition_cost > 0:
+        info['gain_loss'] = info['current_value'] - acquisition_cost
+        info['gain_loss_percent'] = (info['gain_loss'] / acquisition_cost) * 100
+        
+        # Earnings (value - acquisition cost) and performance relative to the acquisition cost over time
+        holding_values = convert_series(dates, close, currency or base_currency, base_currency)
+        if len(close) > 0 and holding_values is not None:
+            holding_values = holding_values * amount
+            info['earnings'] = holding_values - acquisition_cost
+            info['performance'] = (holding_values / acquisition_cost - 1) * 100
+    return info
 
 def update_with_portfolio_info(data, ticker_symbol):
     """Updates the data with portfolio-specific information."""
     try:
-        # Get portfolio data
-        portfolio_data = get_portfolio_data()
+        security_info, holding = find_security(ticker_symbol)
         
-        # Find security info in portfolio
-        security_info = None
-        for asset_class in ['etf', 'stocks', 'bonds', 'commodities', 'realEstate']:
-            for asset in portfolio_data.get(asset_class, []):
-                if asset.get('ticker') == ticker_symbol:
-                    security_info = asset
-                    break
-            if security_info:
-                break
-                
         # If we found security info, add it to the data
         if security_info:
-            data.update({
-                'name': security_info.get('name', ''),
-                'currency': security_info.get('currency', 'EUR'),
-                'isin': security_info.get('isin', ''),
-                'amount': security_info.get('amount', 0),
-                'acquisition_cost': security_info.get('acquisition_cost', 0)
-            })
-            
-            # Calculate current value and gain/loss
-            last_close = data.get('last_close', 0)
-            amount = security_info.get('amount', 0)
-            data['current_value'] = last_close * amount
-            
-            # Calculate gain/loss if acquisition cost is available
-            if 'acquisition_cost' in security_info and security_info['acquisition_cost'] > 0:
-                data['gain_loss'] = data['current_value'] - security_info['acquisition_cost']
-                data['gain_loss_percent'] = (data['gain_loss'] / security_info['acquisition_cost']) * 100
-                
-                # Generate earnings data for visualization (performance relative to acquisition cost over time)
-                if 'values' in data and len(data['values']) > 0:
-                    # Ensure we have the values as float
-                    values = [float(val) for val in data['values']]
-                    
-                    # Calculate earnings for each point in time (current value - acquisition cost)
-                    earnings_values = []
-                    for value in values:
-                        earnings = (value * amount) - security_info['acquisition_cost']
-                        earnings_values.append(earnings)
-                    
-                    data['earnings_values'] = earnings_values
-                    
-                    # Add relative performance to the acquisition cost (percentage gain/loss)
-                    performance_percent = []
-                    for value in values:
-                        current_value = value * amount
-                        perf = ((current_value / security_info['acquisition_cost']) - 1) * 100 if security_info['acquisition_cost'] > 0 else 0
-                        performance_percent.append(perf)
-                    
-                    data['performance_percent'] = performance_percent
+            info = holding_info(security_info, holding, data['dates'], data['values'])
+            if 'earnings' in info:
+                data['earnings_values'] = info.pop('earnings')
+                data['performance_percent'] = info.pop('performance')
+            data.update(info)
                 
         return data
         
@@ -429,181 +300,286 @@ def update_with_portfolio_info(data, ticker_symbol):
         print(f"Error updating portfolio info: {e}")
         return data
 
-def process_timeseries(params):
-    # Ticker-Symbol aus den Parametern extrahieren
+def get_holdings_version():
+    """Time of the last change to the current user's portfolio (None for anonymous users)"""
+    if not current_user.is_authenticated:
+        return None
+    row = db.session.query(PortfolioData.updated_at).filter_by(user_id=current_user.id).first()
+    return row[0] if row else None
+
+def data_cache_entry(ticker_symbol):
+    """Return the (group, version, key) of a /data response.
+    
+    The version covers the stored prices, the holdings and the refresh state
+    the response reports.
+    """
+    header = get_price_header(ticker_symbol)
+    user_id = current_user.id if current_user.is_authenticated else None
+    version = (header.fetch_time if header else None, header.rows if header else 0,
+               get_holdings_version(), is_refreshing(ticker_symbol), get_fetch_error(ticker_symbol))
+    return (user_id, ticker_symbol), version, ()
+
+def parse_tickers(params):
+    """Ticker list of a /compare request, as a list or comma separated, without duplicates"""
+    tickers = params.get('tickers') or []
+    if isinstance(tickers, str):
+        tickers = tickers.split(',')
+    tickers = list(dict.fromkeys(ticker.strip() for ticker in tickers if ticker and ticker.strip()))
+    if not tickers:
+        raise ValueError("Keine Ticker für den Vergleich angegeben")
+    if len(tickers) > MAX_COMPARE_TICKERS:
+        raise ValueError(f"Höchstens {MAX_COMPARE_TICKERS} Ticker können verglichen werden")
+    return tickers
+
+def parse_comparison_params(params):
+    """Validate a /compare request before anything is loaded, raises ValueError"""
+    params = dict(params or {})
+    params['tickers'] = parse_tickers(params)
+    resolve_days(params)
+    return params
+
+def parse_analysis_params(params):
+    """Validate an /analyze request before anything is loaded, raises ValueError.
+    
+    The indicator parameters are replaced by the resolved ones, so requests
+    differing only in defaults share a cache entry.
+    """
+    params = dict(params or {})
+    indicator = get_indicator(params.get('indicator', 'sma'))
+    params['params'] = indicator.resolve_params(params.get('params'))
+    parse_max_points(params.get('max_points'))
+    resolve_days(params)
+    return params
+
+def comparison_cache_entry(params):
+    """Return the (group, version, key) a /compare result is cached under"""
+    tickers = tuple(params['tickers'])
+    headers = get_price_headers(tickers)
+    version = (tuple((header.fetch_time, header.rows) if header else None for header in headers.values()),
+               date.today())
+    key = (params.get('timeframe', '1y'), params.get('start'), params.get('end'))
+    return ('compare', tickers), version, key
+
+def analysis_cache_entry(params):
+    """Return the (group, version, key) an /analyze result is cached under.
+    
+    The version covers everything the result depends on besides the request:
+    the stored prices, the user's holdings and the current day (timeframes
+    are relative to today).
+    """
     ticker_symbol = params.get('ticker', 'EUNL.DE')
+    user_id = current_user.id if current_user.is_authenticated else None
+    header = get_price_header(ticker_symbol)
     
-    # Daten für das ausgewählte Wertpapier abrufen
-    data = get_timeseries_data(ticker_symbol)
-    
-    # Sicherstellen, dass wir Daten haben und diese in ein DataFrame konvertieren
-    if not data.get('dates') or not data.get('values') or len(data['dates']) != len(data['values']):
-        raise ValueError(f"Unvollständige Daten für {ticker_symbol}")
-    
-    df = pd.DataFrame({
-        'date': pd.to_datetime(data['dates']),
-        'value': data['values']
-    })
-    
-    # Zusätzliche OHLC-Daten hinzufügen, wenn verfügbar
-    if 'open_values' in data and len(data['open_values']) == len(data['dates']):
-        df['open'] = data['open_values']
-    if 'high_values' in data and len(data['high_values']) == len(data['dates']):
-        df['high'] = data['high_values']
-    if 'low_values' in data and len(data['low_values']) == len(data['dates']):
-        df['low'] = data['low_values']
-    if 'volume_values' in data and len(data['volume_values']) == len(data['dates']):
-        df['volume'] = data['volume_values']
-    
-    # Nach Zeitraum filtern
+    version = (header.fetch_time if header else None, header.rows if header else 0,
+               get_holdings_version(), date.today())
+    key = (params.get('timeframe', '1y'), params.get('start'), params.get('end'), params.get('max_points'),
+           params.get('indicator', 'sma'),
+           tuple(sorted((str(k), str(v)) for k, v in (params.get('params') or {}).items())))
+    return (user_id, ticker_symbol), version, key
+
+def parse_day(value):
+    """Parse a 'YYYY-MM-DD' request parameter to an epoch day"""
+    try:
+        return date_to_epoch_day(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Ungültiges Datum: {value}")
+
+def resolve_days(params, first_day=None):
+    """Resolve the timeframe or a custom start/end to (start_day, end_day) epoch days.
+    
+    'all' starts at first_day, the first stored date.
+    """
     timeframe = params.get('timeframe', '1y')
-    end_date = datetime.now()
-    
-    if timeframe == '1m':
-        start_date = end_date - timedelta(days=30)
-    elif timeframe == '3m':
-        start_date = end_date - timedelta(days=90)
-    elif timeframe == '6m':
-        start_date = end_date - timedelta(days=180)
-    elif timeframe == '1y':
-        start_date = end_date - timedelta(days=365)
+    end_day = parse_day(params['end']) if params.get('end') else date_to_epoch_day(date.today())
+    
+    if params.get('start'):
+        start_day = parse_day(params['start'])
+    elif timeframe in TIMEFRAME_DAYS:
+        start_day = end_day - TIMEFRAME_DAYS[timeframe]
     else:  # 'all'
-        start_date = df['date'].min()
+        start_day = end_day if first_day is None else first_day
+    return start_day, end_day
+
+def resolve_range(params, series):
+    """Resolve the timeframe or a custom start/end to row positions in the series.
     
-    filtered_df = df[df['date'] >= pd.Timestamp(start_date)]
+    Returns (start, stop, start_day, end_day); the range is found by binary
+    search over the sorted epoch-day array.
+    """
+    start_day, end_day = resolve_days(params, int(series.dates[0]) if len(series) else None)
+    start, stop = series.index_range(start_day, end_day)
+    return start, stop, start_day, end_day
+
+def process_timeseries(params):
+    # Ticker-Symbol aus den Parametern extrahieren
+    ticker_symbol = params.get('ticker', 'EUNL.DE')
+    
+    # Gespeicherte Kursreihe laden, die Spalten sind Views auf die Memory-Map
+    series = get_series(ticker_symbol)
+    if series is None or len(series) == 0:
+        raise ValueError(get_fetch_error(ticker_symbol) or f"Keine Daten für Ticker {ticker_symbol} gefunden")
     
-    # Wenn nach dem Filtern keine Daten übrig sind, einen Fehler ausgeben
-    if filtered_df.empty:
+    # Zeitraum per binärer Suche auf Zeilen abbilden, alle Spalten teilen denselben Ausschnitt
+    start, stop, start_day, end_day = resolve_range(params, series)
+    max_points = parse_max_points(params.get('max_points'))
+    if start >= stop:
         raise ValueError(f"Keine Daten für {ticker_symbol} im ausgewählten Zeitraum")
+    window = slice(start, stop)
+    dates = series.dates[window]
+    close = series.close[window]
+    columns = {}
+    for name in ('open', 'high', 'low', 'volume'):
+        column = getattr(series, name)[window]
+        # OHLCV-Spalten sind NaN, wenn die Quelle keine solchen Daten hatte
+        if not np.isnan(column).all():
+            columns[name] = column
     
-    # Indikator berechnen
+    # Indikator über die gesamte Historie berechnen und dann auf den Zeitraum zuschneiden
     indicator = params.get('indicator', 'sma')
-    indicator_values = []
-    indicator_dates = filtered_df['date'].dt.strftime('%Y-%m-%d').tolist()
-    
-    if indicator == 'sma':
-        # Simple Moving Average (20 Perioden)
-        window = 20
-        sma = filtered_df['value'].rolling(window=window).mean()
-        # NaN-Werte entfernen und sicherstellen, dass die Listen gleich lang sind
-        indicator_values = sma.fillna(method='bfill').tolist()
-    
-    elif indicator == 'ema':
-        # Exponential Moving Average (20 Perioden)
-        window = 20
-        ema = filtered_df['value'].ewm(span=window, adjust=False).mean()
-        indicator_values = ema.tolist()
-    
-    elif indicator == 'bollinger':
-        # Bollinger Bands (20 Perioden, 2 Standardabweichungen)
-        window = 20
-        std_dev = 2
-        
-        # Mittlere Linie (SMA)
-        middle_band = filtered_df['value'].rolling(window=window).mean()
-        
-        # Obere und untere Bänder
-        std = filtered_df['value'].rolling(window=window).std()
-        upper_band = middle_band + (std * std_dev)
-        lower_band = middle_band - (std * std_dev)
-        
-        # NaN-Werte entfernen und sicherstellen, dass die Listen gleich lang sind
-        middle_band = middle_band.fillna(method='bfill')
-        upper_band = upper_band.fillna(method='bfill')
-        lower_band = lower_band.fillna(method='bfill')
-        
-        # Speichere alle drei Linien
-        indicator_values = {
-            'middle': middle_band.tolist(),
-            'upper': upper_band.tolist(),
-            'lower': lower_band.tolist()
-        }
+    prices = {'close': series.close}
+    if np.isnan(series.close).any():
+        prices['close'] = pd.Series(series.close).ffill().to_numpy()
+    if 'high' in columns and 'low' in columns:
+        prices['high'] = series.high
+        prices['low'] = series.low
+    full_values, indicator_params = compute_indicator(indicator, prices, params.get('params'),
+                                                      cache_key=(ticker_symbol, series.header.fetch_time, len(series)))
+    indicator_values = select_values(full_values, window)
     
     # Statistiken berechnen
     stats = {
-        'mean': float(filtered_df['value'].mean()),
-        'std': float(filtered_df['value'].std()),
-        'min': float(filtered_df['value'].min()),
-        'max': float(filtered_df['value'].max()),
-        'latest': float(filtered_df['value'].iloc[-1]) if not filtered_df.empty else 0,
-        'first': float(filtered_df['value'].iloc[0]) if not filtered_df.empty else 0,
-        'change': float(filtered_df['value'].iloc[-1] - filtered_df['value'].iloc[0]) if not filtered_df.empty else 0,
-        'change_percent': float((filtered_df['value'].iloc[-1] / filtered_df['value'].iloc[0] - 1) * 100) if not filtered_df.empty and filtered_df['value'].iloc[0] > 0 else 0,
-        'data_points': len(filtered_df)
+        'mean': float(np.nanmean(close)),
+        'std': float(np.nanstd(close, ddof=1)) if len(close) > 1 else 0.0,
+        'min': float(np.nanmin(close)),
+        'max': float(np.nanmax(close)),
+        'latest': float(close[-1]),
+        'first': float(close[0]),
+        'change': float(close[-1] - close[0]),
+        'change_percent': float((close[-1] / close[0] - 1) * 100) if close[0] > 0 else 0,
+        'data_points': len(close)
     }
     
     # OHLC Statistiken hinzufügen, wenn verfügbar
-    if 'open' in filtered_df.columns:
-        stats['open_latest'] = float(filtered_df['open'].iloc[-1]) if not filtered_df.empty else 0
-    if 'high' in filtered_df.columns:
-        stats['high_max'] = float(filtered_df['high'].max()) if not filtered_df.empty else 0
-    if 'low' in filtered_df.columns:
-        stats['low_min'] = float(filtered_df['low'].min()) if not filtered_df.empty else 0
-    if 'volume' in filtered_df.columns:
-        stats['volume_avg'] = float(filtered_df['volume'].mean()) if not filtered_df.empty else 0
-        stats['volume_latest'] = float(filtered_df['volume'].iloc[-1]) if not filtered_df.empty else 0
+    if 'open' in columns:
+        stats['open_latest'] = float(columns['open'][-1])
+    if 'high' in columns:
+        stats['high_max'] = float(np.nanmax(columns['high']))
+    if 'low' in columns:
+        stats['low_min'] = float(np.nanmin(columns['low']))
+    if 'volume' in columns:
+        columns['volume'] = np.nan_to_num(columns['volume'])
+        stats['volume_avg'] = float(columns['volume'].mean())
+        stats['volume_latest'] = float(columns['volume'][-1])
+    
+    # Portfolio-Informationen für den Ausschnitt berechnen
+    data = {
+        'last_close': series.last_close,
+        'last_date': series.last_date,
+        'last_datetime': f"{series.last_date} 17:30:00",
+        'fetch_time': series.fetch_time
+    }
+    try:
+        security_info, holding = find_security(ticker_symbol)
+        if security_info:
+            data.update(holding_info(security_info, holding, dates, close))
+    except Exception as e:
+        print(f"Error updating portfolio info: {e}")
     
     # Portfolio-Informationen in die Statistiken einfügen
-    if 'amount' in data:
-        stats['amount'] = data.get('amount', 0)
-    if 'last_close' in data:
-        stats['last_close'] = data.get('last_close', 0)
-    if 'last_date' in data:
-        stats['last_date'] = data.get('last_date', '')
-    if 'last_datetime' in data:
-        stats['last_datetime'] = data.get('last_datetime', '')
-    if 'current_value' in data:
-        stats['current_value'] = data.get('current_value', 0)
-    if 'acquisition_cost' in data:
-        stats['acquisition_cost'] = data.get('acquisition_cost', 0)
-    if 'gain_loss' in data:
-        stats['gain_loss'] = data.get('gain_loss', 0)
-        stats['gain_loss_percent'] = data.get('gain_loss_percent', 0)
-    
-    # Prepare earnings data if available
-    earnings_values = None
-    if 'earnings_values' in data and len(data['earnings_values']) == len(data['values']):
-        # Filter earnings_values to match the timeframe
-        if len(data['earnings_values']) == len(data['dates']):
-            earnings_df = pd.DataFrame({
-                'date': pd.to_datetime(data['dates']),
-                'earnings': data['earnings_values']
-            })
-            filtered_earnings_df = earnings_df[earnings_df['date'] >= pd.Timestamp(start_date)]
-            earnings_values = filtered_earnings_df['earnings'].tolist()
+    for key in ['amount', 'last_close', 'last_date', 'last_datetime', 'current_value',
+                'acquisition_cost', 'gain_loss', 'gain_loss_percent']:
+        if key in data:
+            stats[key] = data[key]
+    
+    # Lange Zeiträume optional per LTTB auf max_points Punkte reduzieren,
+    # alle Reihen verwenden dieselben Indizes und bleiben so deckungsgleich
+    downsampled = max_points is not None and len(close) > max_points
+    if downsampled:
+        keep = lttb_indices(dates, close, max_points)
+        dates = dates[keep]
+        close = close[keep]
+        columns = {name: column[keep] for name, column in columns.items()}
+        indicator_values = select_values(indicator_values, keep)
+        if 'earnings' in data:
+            data['earnings'] = data['earnings'][keep]
     
     # Ergebnisse zurückgeben
     result = {
-        'dates': indicator_dates,
-        'values': filtered_df['value'].tolist(),
+        'dates': dates,
+        'values': close,
         'indicator': indicator,
+        'indicator_label': get_indicator(indicator).label,
+        'indicator_overlay': get_indicator(indicator).overlay,
+        'indicator_params': indicator_params,
         'indicator_values': indicator_values,
         'stats': stats,
         'ticker': ticker_symbol,  # Ticker-Symbol zurückgeben für Frontend-Anzeige
-        'timeframe': timeframe,
-        'full_history': data.get('full_history', False),
-        'start_date': start_date.strftime('%Y-%m-%d'),
-        'end_date': end_date.strftime('%Y-%m-%d')
+        'timeframe': 'custom' if params.get('start') or params.get('end') else params.get('timeframe', '1y'),
+        'full_history': True,
+        'start_date': epoch_day_to_str(start_day),
+        'end_date': epoch_day_to_str(end_day),
+        # Mit start/end und ohne max_points liefert der Client einen Ausschnitt in voller Auflösung nach
+        'downsampled': downsampled,
+        'total_points': stats['data_points']
     }
     
     # OHLC-Daten hinzufügen, wenn verfügbar
-    if 'open' in filtered_df.columns:
-        result['open_values'] = filtered_df['open'].tolist()
-    if 'high' in filtered_df.columns:
-        result['high_values'] = filtered_df['high'].tolist()
-    if 'low' in filtered_df.columns:
-        result['low_values'] = filtered_df['low'].tolist()
-    if 'volume' in filtered_df.columns:
-        result['volume_values'] = filtered_df['volume'].tolist()
+    for name, column in columns.items():
+        result[f'{name}_values'] = column
     
     # Add earnings values if available
-    if earnings_values:
-        result['earnings_values'] = earnings_values
+    if 'earnings' in data:
+        result['earnings_values'] = data['earnings']
     
     # Zusätzliche Informationen aus data übernehmen
-    for key in ['name', 'currency', 'isin', 'amount', 'acquisition_cost', 'current_value', 
+    for key in ['name', 'currency', 'base_currency', 'isin', 'amount', 'acquisition_cost', 'current_value', 
                 'gain_loss', 'gain_loss_percent', 'last_date', 'last_datetime', 'fetch_time']:
         if key in data:
             result[key] = data[key]
     
-    return result
\ No newline at end of file
+    return result
+
+def process_comparison(params):
+    """Align several tickers on their shared trading days and normalize them to 100.
+    
+    Every series is sliced to the range by binary search on its stored
+    arrays, then all are joined into one (dates x tickers) matrix; each
+    column starts at 100 on its first date in the range.
+    """
+    tickers = parse_tickers(params)
+    
+    # Alle Kursreihen in einem Durchgang laden, veraltete werden gemeinsam aktualisiert
+    series_by_ticker = get_series_batch(tickers)
+    available = [ticker for ticker in tickers
+                 if series_by_ticker[ticker] is not None and len(series_by_ticker[ticker]) > 0]
+    if not available:
+        raise ValueError("Keine Daten für die ausgewählten Ticker gefunden")
+    
+    first_day = min(int(series_by_ticker[ticker].dates[0]) for ticker in available)
+    start_day, end_day = resolve_days(params, first_day)
+    
+    date_arrays = []
+    value_arrays = []
+    for ticker in available:
+        series = series_by_ticker[ticker]
+        start, stop = series.index_range(start_day, end_day)
+        date_arrays.append(series.dates[start:stop])
+        value_arrays.append(series.close[start:stop])
+    
+    dates, matrix = align_columns(date_arrays, value_arrays)
+    if len(dates) == 0:
+        raise ValueError("Keine Daten für die ausgewählten Ticker im ausgewählten Zeitraum")
+    normalized = normalize_columns(matrix)
+    
+    return {
+        'tickers': available,
+        'missing': [ticker for ticker in tickers if ticker not in available],
+        'dates': dates,
+        'values': normalized,
+        'last_values': {ticker: float(normalized[-1, column])
+                        for column, ticker in enumerate(available) if not np.isnan(normalized[-1, column])},
+        'timeframe': 'custom' if params.get('start') or params.get('end') else params.get('timeframe', '1y'),
+        'start_date': epoch_day_to_str(start_day),
+        'end_date': epoch_day_to_str(end_day)
+    }
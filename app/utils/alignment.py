@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def forward_fill(values):
+    """Carry the last valid value forward over NaNs (along the rows of a 2-D array).
+
+    Leading NaNs stay NaN; works on 1-D arrays and on every column of a
+    matrix at once.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if valid.all():
+        return values
+    rows = np.arange(len(values)).reshape((-1,) + (1,) * (values.ndim - 1))
+    index = np.where(valid, rows, 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    if values.ndim == 1:
+        return values[index]
+    return np.take_along_axis(values, index, axis=0)
+
+
+def align_columns(date_arrays, value_arrays):
+    """Outer-join several (epoch-day dates, values) series on their shared date index.
+
+    Returns (dates, matrix) with one row per date that occurs in any series
+    and one column per series. All series are scattered into the matrix in
+    one pass; gaps (e.g. another exchange's holidays) are forward filled,
+    rows before a series starts stay NaN.
+    """
+    if not date_arrays:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    all_dates = np.concatenate([np.asarray(dates, dtype=np.int64) for dates in date_arrays])
+    dates = np.unique(all_dates)
+    columns = np.repeat(np.arange(len(date_arrays)), [len(values) for values in value_arrays])
+
+    matrix = np.full((len(dates), len(date_arrays)), np.nan)
+    matrix[np.searchsorted(dates, all_dates), columns] = np.concatenate(value_arrays)
+    return dates, forward_fill(matrix)
+
+
+def normalize_columns(matrix, base=100.0):
+    """Scale every column so its first valid value equals base"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.size == 0:
+        return matrix
+    valid = ~np.isnan(matrix)
+    first = matrix[valid.argmax(axis=0), np.arange(matrix.shape[1])]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first = np.where(first > 0, first, np.nan)
+        return matrix / first * base
@@ -0,0 +1,56 @@
+import numpy as np
+
+# Smallest max_points a client may request
+MIN_POINTS = 10
+
+
+def lttb_indices(x, y, threshold):
+    """Select `threshold` points of a series with Largest-Triangle-Three-Buckets.
+
+    Returns the sorted row indices to keep; first and last points are always
+    kept. Apply the same indices to every column of a chart so all series
+    stay aligned.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # Bucket i covers rows edges[i]:edges[i + 1], the first and last point are buckets of their own
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # Mean point of every bucket (the last point counts as the final bucket)
+    counts = np.diff(np.append(edges, n))
+    average_x = (np.add.reduceat(x, edges) / counts).tolist()
+    average_y = (np.add.reduceat(y, edges) / counts).tolist()
+    edges = edges.tolist()
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        # Twice the triangle area between the previous pick, each candidate and the next bucket's mean
+        area = np.abs((px - average_x[i + 1]) * (y[start:stop] - py)
+                      - (px - x[start:stop]) * (average_y[i + 1] - py))
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def parse_max_points(value):
+    """Validate the max_points request parameter, None means full resolution"""
+    if value in (None, '', 0, '0'):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Ungültiger Wert für max_points: {value}")
+    if value < MIN_POINTS:
+        raise ValueError(f"max_points muss mindestens {MIN_POINTS} sein")
+    return value
@@ -0,0 +1,90 @@
+import numpy as np
+from flask import current_app, has_app_context
+from app.utils.alignment import forward_fill
+from app.utils.market_data import get_prices, get_series
+
+DEFAULT_BASE_CURRENCY = 'EUR'
+
+
+def get_base_currency():
+    """Currency all valuations are converted to (BASE_CURRENCY setting)"""
+    if has_app_context():
+        return current_app.config.get('BASE_CURRENCY', DEFAULT_BASE_CURRENCY)
+    return DEFAULT_BASE_CURRENCY
+
+
+def fx_ticker(currency, base_currency):
+    """Yahoo ticker of the rate converting one unit of currency into base_currency"""
+    return f"{currency.upper()}{base_currency.upper()}=X"
+
+
+def fx_tickers_for(currencies, base_currency=None):
+    """FX tickers needed to convert the given currencies into the base currency"""
+    base_currency = base_currency or get_base_currency()
+    return sorted({fx_ticker(currency, base_currency) for currency in currencies
+                   if currency and currency.upper() != base_currency.upper()})
+
+
+def rates_from_prices(currencies, prices, base_currency=None):
+    """Map currencies to their latest rate using already resolved FX ticker prices.
+
+    A currency without a stored rate maps to NaN, so values converted with
+    it are recognizable instead of silently counted one to one.
+    """
+    base_currency = base_currency or get_base_currency()
+    rates = {}
+    for currency in set(currencies):
+        if not currency or currency.upper() == base_currency.upper():
+            rates[currency] = 1.0
+            continue
+        rate = prices.get(fx_ticker(currency, base_currency)) or 0
+        if rate <= 0:
+            print(f"No FX rate for {currency}/{base_currency}")
+            rate = np.nan
+        rates[currency] = rate
+    return rates
+
+
+def get_fx_rates(currencies, base_currency=None):
+    """Return the latest conversion rate into the base currency for each currency"""
+    base_currency = base_currency or get_base_currency()
+    prices = get_prices(fx_tickers_for(currencies, base_currency))
+    return rates_from_prices(currencies, prices, base_currency)
+
+
+def fx_rates_for_dates(currency, dates, base_currency=None):
+    """Return conversion rates aligned to an epoch-day date array.
+
+    Each date gets the rate of the last FX bar on or before it (forward
+    fill); dates before the first FX bar use the first rate. Returns None
+    if there is no FX history for the currency.
+    """
+    base_currency = base_currency or get_base_currency()
+    dates = np.asarray(dates)
+    if not currency or currency.upper() == base_currency.upper():
+        return np.ones(len(dates))
+
+    series = get_series(fx_ticker(currency, base_currency))
+    if series is None or len(series) == 0:
+        print(f"No FX history for {currency}/{base_currency}")
+        return None
+
+    positions = np.searchsorted(series.dates, dates, side='right') - 1
+    rates = series.close[np.clip(positions, 0, len(series) - 1)]
+    # Holidays can leave gaps in the FX close, carry the previous rate forward
+    if np.isnan(rates).any():
+        rates = forward_fill(rates)
+        valid = ~np.isnan(rates)
+        if not valid.any():
+            print(f"No FX history for {currency}/{base_currency}")
+            return None
+        rates[~valid] = rates[valid][0]
+    return rates
+
+
+def convert_series(dates, values, currency, base_currency=None):
+    """Convert a value series into the base currency with one aligned multiplication, None without FX history"""
+    rates = fx_rates_for_dates(currency, dates, base_currency)
+    if rates is None:
+        return None
+    return np.asarray(values, dtype=np.float64) * rates
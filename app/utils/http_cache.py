@@ -0,0 +1,80 @@
+import hashlib
+from flask import current_app, request, jsonify
+from app.utils.serialization import negotiate, render, make_body_response
+
+# Seconds nginx may serve a response from its per-session micro-cache (X-Accel-Expires)
+MICRO_CACHE_SECONDS = 5
+
+
+def make_etag(*parts):
+    """Strong ETag from the versions a response is derived from"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def set_cache_headers(response, etag, micro_cache=True):
+    """Attach the ETag and caching policy to a per-user response.
+
+    Browsers revalidate on every use (cheap 304s), nginx may keep the
+    response for MICRO_CACHE_SECONDS keyed by the session cookie unless
+    micro_cache is off (e.g. for progress that is polled).
+    """
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['X-Accel-Expires'] = str(MICRO_CACHE_SECONDS if micro_cache else 0)
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Cookie')
+    return response
+
+
+def not_modified(etag, micro_cache=True):
+    """Return a 304 response if the request's If-None-Match matches, else None.
+
+    Call it before computing the body so unchanged data costs only the
+    version lookups.
+    """
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains(etag):
+        return set_cache_headers(current_app.response_class(status=304), etag, micro_cache)
+    return None
+
+
+def cached_response(parse, entry, compute, cache=None, requested=None):
+    """Serve a derived per-user response through negotiation, ETag revalidation and a result cache.
+
+    parse() returns the validated request parameters, entry(params) returns
+    (group, version, key, *context) covering everything the result depends
+    on, and compute(params, *context) the payload. Unsupported formats get
+    406, a ValueError from parse or entry (invalid request) 400, a
+    LookupError from entry (nothing to compute) or a ValueError from compute
+    (no data for the request) 404, so validation belongs in parse. Rendered bodies
+    are kept in cache (a ResultCache) if given, so hits skip both the
+    computation and the serialization.
+    """
+    try:
+        fmt, encoding = negotiate(request, requested)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 406
+    try:
+        params = parse()
+        group, version, key, *context = entry(params)
+    except LookupError as e:
+        return jsonify({'error': e.args[0] if e.args else 'Nicht gefunden'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = tuple(key) + (fmt, encoding)
+    etag = make_etag(group, version, key)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    cached = cache.get(group, version, key) if cache is not None else None
+    if cached is None:
+        try:
+            payload = compute(params, *context)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+        cached = render(payload, fmt, encoding)
+        if cache is not None:
+            cache.put(group, version, key, cached, len(cached[0]))
+    return set_cache_headers(make_body_response(*cached), etag)
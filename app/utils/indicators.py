@@ -0,0 +1,250 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Trading days per year, used to annualize volatilities
+TRADING_DAYS = 252
+
+# Bounds for user supplied window lengths
+MIN_WINDOW = 2
+MAX_WINDOW = 1000
+
+# Full-history indicator results kept per (ticker, fetch time, indicator, params)
+RESULT_CACHE_SIZE = 128
+
+
+class Indicator:
+    """A technical indicator computed over the full price history.
+
+    func(prices, **params) takes a dict of contiguous float64 arrays
+    ('close' and, if available, 'high'/'low') and returns one array or a
+    dict of named arrays aligned to the input; warm-up values are NaN.
+    overlay marks indicators drawn on the price axis.
+    """
+
+    def __init__(self, name, label, func, defaults, overlay):
+        self.name = name
+        self.label = label
+        self.func = func
+        self.defaults = defaults
+        self.overlay = overlay
+
+    def resolve_params(self, params=None):
+        """Merge user params into the defaults, validating types and ranges"""
+        resolved = dict(self.defaults)
+        for key, value in (params or {}).items():
+            if key not in self.defaults or value in (None, ''):
+                continue
+            try:
+                if isinstance(self.defaults[key], int):
+                    value = int(value)
+                    valid = MIN_WINDOW <= value <= MAX_WINDOW
+                else:
+                    value = float(value)
+                    valid = 0 < value <= 10
+            except (TypeError, ValueError):
+                valid = False
+            if not valid:
+                raise ValueError(f"Ungültiger Wert für Parameter {key}: {value}")
+            resolved[key] = value
+        return resolved
+
+    def compute(self, prices, params=None):
+        return self.func(prices, **self.resolve_params(params))
+
+
+INDICATORS = {}
+
+
+def register(name, label, overlay=False, **defaults):
+    """Decorator adding an indicator kernel to the registry"""
+    def decorator(func):
+        INDICATORS[name] = Indicator(name, label, func, defaults, overlay)
+        return func
+    return decorator
+
+
+def get_indicator(name):
+    indicator = INDICATORS.get(name)
+    if indicator is None:
+        raise ValueError(f"Unbekannter Indikator: {name}")
+    return indicator
+
+
+# Kernels
+
+def rolling_mean(values, window):
+    """Simple moving average, NaN until the window is filled"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumsum = np.cumsum(np.insert(values, 0, 0.0))
+        result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def rolling_std(values, window):
+    """Rolling sample standard deviation, NaN until the window is filled"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).std(axis=1, ddof=1)
+    return result
+
+
+def ewma(values, alpha, block=128):
+    """Exponentially weighted mean y[t] = alpha * x[t] + (1 - alpha) * y[t - 1], y[0] = x[0].
+
+    The recursion is solved in closed form per block of `block` values so
+    only len(values) / block steps run in Python; the block length keeps
+    (1 - alpha) ** -block inside the float64 range.
+    """
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+    if alpha >= 1:
+        result[:] = values
+        return result
+    decay = 1.0 - alpha
+    steps = np.arange(block)
+    growth = decay ** -steps
+    shrink = decay ** steps
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        size = len(chunk)
+        weighted = np.cumsum(chunk * growth[:size]) * shrink[:size] * alpha
+        result[start:start + size] = shrink[:size] * decay * previous + weighted
+        previous = result[start + size - 1]
+    return result
+
+
+def ema(values, span):
+    return ewma(values, 2.0 / (span + 1))
+
+
+def log_returns(values):
+    """Daily log returns aligned to values (first entry NaN)"""
+    result = np.full(len(values), np.nan)
+    result[1:] = np.diff(np.log(values))
+    return result
+
+
+@register('sma', 'SMA', overlay=True, window=20)
+def sma_indicator(prices, window):
+    return rolling_mean(prices['close'], window)
+
+
+@register('ema', 'EMA', overlay=True, window=20)
+def ema_indicator(prices, window):
+    return ema(prices['close'], window)
+
+
+@register('bollinger', 'Bollinger Bands', overlay=True, window=20, std_dev=2.0)
+def bollinger_indicator(prices, window, std_dev):
+    middle = rolling_mean(prices['close'], window)
+    std = rolling_std(prices['close'], window)
+    return {
+        'middle': middle,
+        'upper': middle + std * std_dev,
+        'lower': middle - std * std_dev
+    }
+
+
+@register('rsi', 'RSI', window=14)
+def rsi_indicator(prices, window):
+    """Relative Strength Index with Wilder's smoothing (0-100)"""
+    close = prices['close']
+    result = np.full(len(close), np.nan)
+    if len(close) <= window:
+        return result
+    change = np.diff(close)
+    gain = ewma(np.clip(change, 0, None), 1.0 / window)
+    loss = ewma(np.clip(-change, 0, None), 1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(loss > 0, 100 - 100 / (1 + gain / loss), 100.0)
+    result[window:] = rsi[window - 1:]
+    return result
+
+
+@register('macd', 'MACD', fast=12, slow=26, signal=9)
+def macd_indicator(prices, fast, slow, signal):
+    macd = ema(prices['close'], fast) - ema(prices['close'], slow)
+    signal_line = ema(macd, signal)
+    return {
+        'macd': macd,
+        'signal': signal_line,
+        'histogram': macd - signal_line
+    }
+
+
+@register('atr', 'ATR', window=14)
+def atr_indicator(prices, window):
+    """Average True Range with Wilder's smoothing, close-to-close range without high/low"""
+    close = prices['close']
+    result = np.full(len(close), np.nan)
+    if len(close) <= window:
+        return result
+    previous = close[:-1]
+    high = prices.get('high')
+    low = prices.get('low')
+    if high is not None and low is not None and not np.isnan(high).all():
+        high, low = high[1:], low[1:]
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    else:
+        true_range = np.abs(close[1:] - previous)
+    true_range = np.nan_to_num(true_range)
+    result[window:] = ewma(true_range, 1.0 / window)[window - 1:]
+    return result
+
+
+@register('volatility', 'Volatilität (annualisiert, %)', window=20)
+def volatility_indicator(prices, window):
+    """Rolling standard deviation of daily log returns, annualized in percent"""
+    result = np.full(len(prices['close']), np.nan)
+    result[1:] = rolling_std(log_returns(prices['close'])[1:], window) * np.sqrt(TRADING_DAYS) * 100
+    return result
+
+
+@register('drawdown', 'Drawdown (%)')
+def drawdown_indicator(prices):
+    """Decline from the running maximum in percent"""
+    close = prices['close']
+    return (close / np.maximum.accumulate(close) - 1) * 100
+
+
+# Cached computation
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def compute_indicator(name, prices, params=None, cache_key=None):
+    """Compute an indicator over the full history, returns (values, resolved params).
+
+    With a cache_key (e.g. ticker and fetch time) the full-history result is
+    memoized, so slicing it to another timeframe does not recompute it.
+    """
+    indicator = get_indicator(name)
+    resolved = indicator.resolve_params(params)
+    if cache_key is None:
+        return indicator.func(prices, **resolved), resolved
+
+    key = (cache_key, name, tuple(sorted(resolved.items())))
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key], resolved
+    values = indicator.func(prices, **resolved)
+    with _results_lock:
+        _results[key] = values
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return values, resolved
+
+
+def select_values(values, index):
+    """Index one indicator output (array or dict of arrays) with a slice or index array"""
+    if isinstance(values, dict):
+        return {key: array[index] for key, array in values.items()}
+    return values[index]
+
@@ -0,0 +1,111 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+
+@lru_cache(maxsize=None)
+def easter_sunday(year):
+    """Gregorian Easter Sunday of a year (Gauss' algorithm in the form of Meeus)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+class ExchangeCalendar:
+    """Regular trading hours of an exchange (weekends, fixed-date and Easter holidays closed)"""
+
+    def __init__(self, name, timezone, open_time, close_time, holidays=(), easter_holidays=(), always_open=False):
+        self.name = name
+        self.tz = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.holidays = set(holidays)  # (month, day) tuples
+        self.easter_holidays = set(easter_holidays)  # days relative to Easter Sunday
+        self.always_open = always_open
+
+    def is_trading_day(self, day):
+        if day.weekday() >= 5 or (day.month, day.day) in self.holidays:
+            return False
+        return not self.easter_holidays or (day - easter_sunday(day.year)).days not in self.easter_holidays
+
+    def is_open(self, now):
+        """Check if the exchange is in its trading session at the aware datetime now"""
+        if self.always_open:
+            return now.astimezone(self.tz).weekday() < 5
+        local = now.astimezone(self.tz)
+        return self.is_trading_day(local.date()) and self.open_time <= local.time() < self.close_time
+
+    def previous_close(self, now):
+        """Return the close of the most recent session that ended before now"""
+        local = now.astimezone(self.tz)
+        day = local.date()
+        if not self.is_trading_day(day) or local.time() < self.close_time:
+            day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return datetime.combine(day, self.close_time, tzinfo=self.tz)
+
+    def next_close(self, now):
+        """Return the close of the next session ending after now"""
+        local = now.astimezone(self.tz)
+        day = local.date()
+        if not self.is_trading_day(day) or local.time() >= self.close_time:
+            day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return datetime.combine(day, self.close_time, tzinfo=self.tz)
+
+
+EUROPEAN_HOLIDAYS = [(1, 1), (12, 24), (12, 25), (12, 26), (12, 31)]
+US_HOLIDAYS = [(1, 1), (7, 4), (12, 25)]
+# Good Friday and Easter Monday; US exchanges only close on Good Friday
+GOOD_FRIDAY = -2
+EASTER_MONDAY = 1
+EUROPEAN_EASTER_HOLIDAYS = [GOOD_FRIDAY, EASTER_MONDAY]
+US_EASTER_HOLIDAYS = [GOOD_FRIDAY]
+
+XETRA = ExchangeCalendar('XETRA', 'Europe/Berlin', time(9, 0), time(17, 30), EUROPEAN_HOLIDAYS,
+                         EUROPEAN_EASTER_HOLIDAYS)
+EURONEXT_PARIS = ExchangeCalendar('Euronext Paris', 'Europe/Paris', time(9, 0), time(17, 30), EUROPEAN_HOLIDAYS,
+                                  EUROPEAN_EASTER_HOLIDAYS)
+EURONEXT_AMSTERDAM = ExchangeCalendar('Euronext Amsterdam', 'Europe/Amsterdam', time(9, 0), time(17, 30), EUROPEAN_HOLIDAYS,
+                                      EUROPEAN_EASTER_HOLIDAYS)
+BORSA_ITALIANA = ExchangeCalendar('Borsa Italiana', 'Europe/Rome', time(9, 0), time(17, 30), EUROPEAN_HOLIDAYS,
+                                  EUROPEAN_EASTER_HOLIDAYS)
+WIENER_BOERSE = ExchangeCalendar('Wiener Börse', 'Europe/Vienna', time(9, 0), time(17, 30), EUROPEAN_HOLIDAYS,
+                                 EUROPEAN_EASTER_HOLIDAYS)
+SIX = ExchangeCalendar('SIX Swiss Exchange', 'Europe/Zurich', time(9, 0), time(17, 30), EUROPEAN_HOLIDAYS,
+                       EUROPEAN_EASTER_HOLIDAYS)
+LSE = ExchangeCalendar('London Stock Exchange', 'Europe/London', time(8, 0), time(16, 30), [(1, 1), (12, 25), (12, 26)],
+                       EUROPEAN_EASTER_HOLIDAYS)
+NYSE = ExchangeCalendar('NYSE', 'America/New_York', time(9, 30), time(16, 0), US_HOLIDAYS, US_EASTER_HOLIDAYS)
+# Currency pairs (EURUSD=X) trade around the clock on weekdays, daily bars roll over at midnight UTC
+FOREX = ExchangeCalendar('Forex', 'UTC', time(0, 0), time(23, 59), always_open=True)
+
+SUFFIX_CALENDARS = {
+    '.DE': XETRA,
+    '.F': XETRA,
+    '.PA': EURONEXT_PARIS,
+    '.AS': EURONEXT_AMSTERDAM,
+    '.MI': BORSA_ITALIANA,
+    '.VI': WIENER_BOERSE,
+    '.SW': SIX,
+    '.L': LSE,
+    '=X': FOREX,
+}
+
+
+def calendar_for_ticker(ticker_symbol):
+    """Derive the exchange calendar from the ticker suffix (US listing if none)"""
+    for suffix, calendar in SUFFIX_CALENDARS.items():
+        if ticker_symbol.upper().endswith(suffix):
+            return calendar
+    return NYSE
@@ -0,0 +1,391 @@
+import os
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from functools import partial
+import numpy as np
+from flask import current_app, has_app_context, has_request_context
+from app.utils.market_calendar import calendar_for_ticker
+from app.utils.price_store import get_price_store, frame_to_columns, epoch_day_to_str, FLAG_CLOSE_ONLY
+from app.utils.providers import create_provider
+from app.utils.rate_limit import get_rate_limiter
+from app.utils.refresher import BackgroundRefresher
+
+# While the exchange is trading, cached prices are considered fresh for this long
+INTRADAY_MAX_AGE = timedelta(minutes=15)
+
+# Time after the session close until upstream reliably has the final daily bar
+CLOSE_SETTLE_DELAY = timedelta(minutes=30)
+
+# Stale prices younger than this are served immediately while a background
+# refresh runs; older ones block the request (PRICE_CACHE_HARD_MAX_AGE_HOURS)
+CACHE_HARD_MAX_AGE = timedelta(hours=72)
+
+# Days of already stored history that are requested again on incremental updates
+INCREMENTAL_OVERLAP_DAYS = 7
+
+# Returned by apply_incremental when the overlap window came back without rows
+NO_DATA = 'no data'
+
+# Relative close difference in the overlap that means the history was re-adjusted
+# (split or dividend) and has to be fetched again completely
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# Retry delay after a failed fetch, doubled for every further failure
+FAILURE_BASE_DELAY = timedelta(minutes=1)
+FAILURE_MAX_DELAY = timedelta(hours=1)
+
+# Seconds a background fetch waits for the provider's request budget before giving up;
+# fetches inside a web request never wait and serve the stored data instead
+RATE_LIMIT_TIMEOUT = 30
+
+# Seconds a blocking fetch waits in total for other workers' fetches of the same tickers;
+# inside a web request only briefly, the stored data is served if the lock stays busy
+LOCK_TIMEOUT = 60
+REQUEST_LOCK_TIMEOUT = 2
+
+
+def is_header_fresh(ticker_symbol, header, now=None):
+    """Check if stored prices are fresh according to the ticker's exchange calendar.
+
+    During trading hours data is fresh for INTRADAY_MAX_AGE. Outside of them
+    it stays fresh if it was fetched after the last session close had
+    settled, i.e. until the next expected close.
+    """
+    if header is None:
+        return False
+    now = now or datetime.now(timezone.utc)
+    fetched = datetime.fromtimestamp(header.fetch_time, timezone.utc)
+    calendar = calendar_for_ticker(ticker_symbol)
+
+    if calendar.is_open(now):
+        return now - fetched <= INTRADAY_MAX_AGE
+
+    settled = calendar.previous_close(now) + CLOSE_SETTLE_DELAY
+    if now < settled:
+        # Shortly after the close the final bar may still change
+        return now - fetched <= INTRADAY_MAX_AGE
+    return fetched >= settled
+
+
+_provider = None
+
+
+def get_provider():
+    """Return the process-wide price provider (PRICE_PROVIDER, default yfinance)"""
+    global _provider
+    if _provider is None:
+        _provider = create_provider(os.environ.get('PRICE_PROVIDER'))
+    return _provider
+
+
+def set_provider(provider):
+    """Replace the price provider, e.g. with a synthetic one for offline benchmarks"""
+    global _provider
+    _provider = provider
+
+
+def acquire_request_budget(provider, requests):
+    """Take tokens for a provider call from the budget shared by all workers.
+
+    Returns False if the budget did not allow the call within
+    RATE_LIMIT_TIMEOUT, or right away inside a web request so the worker is
+    not blocked (the caller keeps serving the stored prices). requests must
+    not exceed provider.burst, larger batches are split by request_chunks().
+    """
+    if provider.rate is None:
+        return True
+    timeout = 0 if has_request_context() else RATE_LIMIT_TIMEOUT
+    waited = get_rate_limiter().acquire(provider.name, requests, rate=provider.rate,
+                                        burst=provider.burst, timeout=timeout)
+    if waited is None:
+        print(f"Rate limit budget of {provider.name} exhausted, skipping {requests} requests")
+        return False
+    if waited > 0:
+        print(f"Waited {waited:.2f}s for the {provider.name} rate limit")
+    return True
+
+
+def request_chunks(provider, items):
+    """Split a batch into chunks the provider's request budget can grant at once"""
+    size = max(1, provider.burst) if provider.rate is not None else max(1, len(items))
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def is_backing_off(ticker_symbol, now=None):
+    """Check if a ticker recently failed and its retry delay has not passed yet"""
+    failure = get_price_store().failure(ticker_symbol)
+    return failure is not None and (now or time.time()) < failure['retry_at']
+
+
+def get_fetch_error(ticker_symbol):
+    """Return the error of the last failed fetch of a ticker, if it has not recovered since"""
+    failure = get_price_store().failure(ticker_symbol)
+    return failure['error'] if failure else None
+
+
+def record_fetch_failure(ticker_symbol, error):
+    """Put a ticker into the negative cache, the last good series stays untouched"""
+    entry = get_price_store().record_failure(ticker_symbol, error, FAILURE_BASE_DELAY.total_seconds(),
+                                             FAILURE_MAX_DELAY.total_seconds())
+    print(f"Fetch of {ticker_symbol} failed ({entry['failures']}x), "
+          f"retrying in {entry['retry_at'] - entry['failed_at']:.0f}s: {error}")
+
+
+def cache_hard_max_age():
+    """Maximum age of stored prices that may still be served without blocking"""
+    if has_app_context():
+        hours = current_app.config.get('PRICE_CACHE_HARD_MAX_AGE_HOURS')
+        if hours is not None:
+            return timedelta(hours=float(hours))
+    return CACHE_HARD_MAX_AGE
+
+
+def is_header_servable(header):
+    """Check if a stored price header may be served while it is refreshed"""
+    return header is not None and header.age_seconds() <= cache_hard_max_age().total_seconds()
+
+
+def is_cache_fresh(ticker_symbol):
+    """Check if the stored prices for a ticker are fresh"""
+    return is_header_fresh(ticker_symbol, get_price_store().header(ticker_symbol))
+
+
+def overlap_matches(series, dates, close):
+    """Check that re-fetched closes agree with the stored ones on overlapping days.
+
+    The last stored bar is skipped since it may have been a partial intraday bar.
+    """
+    stored_dates = series.dates[:-1]
+    common, stored_idx, new_idx = np.intersect1d(stored_dates, dates, assume_unique=True, return_indices=True)
+    if len(common) == 0:
+        return False
+    stored_close = series.close[stored_idx]
+    new_close = close[new_idx]
+    return bool(np.allclose(new_close, stored_close, rtol=ADJUSTMENT_TOLERANCE, equal_nan=True))
+
+
+def can_update_incrementally(series):
+    """Check if a stored series can be extended instead of downloaded again"""
+    return series is not None and len(series) > 1 and not series.header.flags & FLAG_CLOSE_ONLY
+
+
+def incremental_start(series):
+    """First date requested when extending a stored series"""
+    return epoch_day_to_str(int(series.dates[-1]) - INCREMENTAL_OVERLAP_DAYS)
+
+
+def apply_incremental(ticker_symbol, series, history):
+    """Append a downloaded overlap window to a stored series.
+
+    Returns the new header, None if a full refetch is required, or NO_DATA
+    if the download is empty: the overlap window always contains stored
+    trading days, so an empty result means the fetch failed (yfinance
+    swallows per-ticker errors) and the stored rows must not be marked fresh.
+    """
+    store = get_price_store()
+    if history is None or history.empty:
+        return NO_DATA
+
+    columns = frame_to_columns(history)
+    if not overlap_matches(series, columns[0], columns[4]):
+        print(f"Adjusted history changed for {ticker_symbol}, fetching full history")
+        return None
+    return store.append(ticker_symbol, *columns)
+
+
+def lock_tickers(ticker_symbols, stack, wait=True):
+    """Acquire the per-ticker fetch locks (single-flight across workers).
+
+    Locks held by another worker are waited for if wait=True (up to
+    LOCK_TIMEOUT for all tickers together, REQUEST_LOCK_TIMEOUT inside a
+    web request), otherwise those tickers are skipped since the other
+    worker is already fetching them. Locks are taken in sorted ticker order,
+    so two workers waiting for overlapping sets cannot deadlock while each
+    holds a lock the other one needs. Returns the tickers locked by us.
+    """
+    store = get_price_store()
+    locked = []
+    deadline = time.time() + (REQUEST_LOCK_TIMEOUT if has_request_context() else LOCK_TIMEOUT)
+    for ticker_symbol in sorted(ticker_symbols):
+        lock = store.lock(ticker_symbol)
+        if lock.acquire(timeout=max(deadline - time.time(), 0)) if wait else lock.acquire(blocking=False):
+            stack.callback(lock.release)
+            locked.append(ticker_symbol)
+        elif wait:
+            print(f"Timed out waiting for the fetch lock of {ticker_symbol}")
+    return locked
+
+
+def refresh_tickers(ticker_symbols, full=False, provider=None, wait=True):
+    """Update several tickers in the price store with grouped downloads.
+
+    Only one worker fetches a ticker at a time; tickers that another worker
+    refreshed while we waited for its lock are not fetched again, and with
+    wait=False tickers locked elsewhere are skipped. Tickers in the negative
+    cache are skipped until their retry delay passed (unless full=True).
+
+    Stored tickers are extended incrementally (one download per distinct
+    start date); new tickers, tickers with re-adjusted history, or all
+    tickers if full=True are fetched completely in one more download.
+    The provider defaults to get_provider() and can be passed explicitly,
+    e.g. a local fake in tests.
+
+    Returns a dict of ticker -> new PriceHeader for every updated ticker.
+    """
+    provider = provider or get_provider()
+    store = get_price_store()
+    started = time.time()
+    headers = {}
+
+    with ExitStack() as stack:
+        locked = lock_tickers(list(dict.fromkeys(ticker_symbols)), stack, wait=wait)
+
+        to_fetch = []
+        for ticker_symbol in locked:
+            header = store.header(ticker_symbol)
+            if header is not None and header.fetch_time >= started:
+                # Another worker finished this ticker while we waited for the lock
+                headers[ticker_symbol] = header
+            elif not full and is_backing_off(ticker_symbol):
+                # Recently failed, keep serving the last good data until the retry delay passed
+                continue
+            else:
+                to_fetch.append(ticker_symbol)
+
+        if to_fetch:
+            headers.update(fetch_into_store(to_fetch, full, provider))
+    return headers
+
+
+def fetch_into_store(ticker_symbols, full, provider):
+    """Download tickers and write them to the store (caller holds their locks)"""
+    store = get_price_store()
+    headers = {}
+    needs_full = []
+
+    by_start = {}
+    for ticker_symbol in ticker_symbols:
+        series = None if full else store.load(ticker_symbol)
+        if can_update_incrementally(series):
+            by_start.setdefault(incremental_start(series), []).append((ticker_symbol, series))
+        else:
+            needs_full.append(ticker_symbol)
+
+    groups = [(start, chunk) for start, group in by_start.items() for chunk in request_chunks(provider, group)]
+    for start, group in groups:
+        print(f"Fetching new data for {len(group)} tickers since {start}")
+        if not acquire_request_budget(provider, len(group)):
+            continue
+        try:
+            histories = provider.download([ticker_symbol for ticker_symbol, _ in group], start=start)
+        except Exception as e:
+            for ticker_symbol, _ in group:
+                record_fetch_failure(ticker_symbol, e)
+            continue
+        for ticker_symbol, series in group:
+            header = apply_incremental(ticker_symbol, series, histories.get(ticker_symbol))
+            if header is None:
+                needs_full.append(ticker_symbol)
+            elif header is NO_DATA:
+                record_fetch_failure(ticker_symbol, 'No data found')
+            else:
+                store.clear_failure(ticker_symbol)
+                headers[ticker_symbol] = header
+
+    for chunk in request_chunks(provider, needs_full):
+        print(f"Fetching full history for {', '.join(chunk)}")
+        if not acquire_request_budget(provider, len(chunk)):
+            continue
+        try:
+            histories = provider.download(chunk)
+            error = 'No data found'
+        except Exception as e:
+            histories = {}
+            error = e
+        for ticker_symbol in chunk:
+            history = histories.get(ticker_symbol)
+            if history is None or history.empty:
+                record_fetch_failure(ticker_symbol, error)
+                continue
+            store.clear_failure(ticker_symbol)
+            headers[ticker_symbol] = store.write_frame(ticker_symbol, history)
+
+    return headers
+
+
+def refresh_ticker(ticker_symbol, full=False):
+    """Update a single ticker in the price store from upstream"""
+    header = refresh_tickers([ticker_symbol], full=full).get(ticker_symbol)
+    if header is None:
+        raise ValueError(get_fetch_error(ticker_symbol) or f"No data found for {ticker_symbol}")
+    return header
+
+
+# Per-worker background thread for stale-while-revalidate refreshes
+refresher = BackgroundRefresher(partial(refresh_tickers, wait=False))
+
+
+def get_price_headers(ticker_symbols, wait=False):
+    """Return price headers for several tickers (stale-while-revalidate).
+
+    Stale headers younger than the hard max age are returned immediately and
+    refreshed in the background. Missing or too old ones (or all stale ones
+    if wait=True) are refreshed in one blocking batch. Tickers whose refresh
+    fails keep their stale header, or None if nothing is stored.
+    """
+    store = get_price_store()
+    headers = {ticker_symbol: store.header(ticker_symbol) for ticker_symbol in ticker_symbols}
+
+    blocking = []
+    background = []
+    for ticker_symbol, header in headers.items():
+        if is_header_fresh(ticker_symbol, header):
+            continue
+        if wait or not is_header_servable(header):
+            blocking.append(ticker_symbol)
+        else:
+            background.append(ticker_symbol)
+
+    if background:
+        refresher.submit(background)
+    if blocking:
+        refreshed = refresh_tickers(blocking)
+        # Tickers whose lock stayed busy may have been stored by the other worker meanwhile
+        headers.update({ticker_symbol: refreshed.get(ticker_symbol) or store.header(ticker_symbol)
+                        for ticker_symbol in blocking})
+    return headers
+
+
+def is_refreshing(ticker_symbol):
+    """Check if a background refresh is pending for a ticker in this worker"""
+    return refresher.is_refreshing(ticker_symbol)
+
+
+def get_prices(ticker_symbols):
+    """Return the latest close for several tickers (0 if no price is available)"""
+    return {ticker_symbol: header.last_close if header else 0
+            for ticker_symbol, header in get_price_headers(ticker_symbols).items()}
+
+
+def get_price_header(ticker_symbol):
+    """Return the price header for a ticker, refreshing it if stale"""
+    return get_price_headers([ticker_symbol])[ticker_symbol]
+
+
+def get_series(ticker_symbol):
+    """Return the memory-mapped PriceSeries for a ticker, refreshing it if stale"""
+    if get_price_header(ticker_symbol) is None:
+        return None
+    return get_price_store().load(ticker_symbol)
+
+
+def get_series_batch(ticker_symbols):
+    """Return memory-mapped PriceSeries for several tickers (None if unavailable).
+
+    Stale tickers are refreshed in one batch like get_price_headers; the
+    columns come straight from the shared maps of the price store.
+    """
+    store = get_price_store()
+    return {ticker_symbol: store.load(ticker_symbol) if header else None
+            for ticker_symbol, header in get_price_headers(ticker_symbols).items()}
@@ -1,7 +1,7 @@
 import json
 import os
 from app import db
-from app.models import PortfolioData, User
+from app.models import PortfolioData, Holding, User
 from flask import current_app
 from flask_login import current_user
 
@@ -136,4 +136,42 @@ def migrate_existing_portfolio_data():
         return True
     except Exception as e:
         print(f"Error migrating portfolio data: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def migrate_portfolio_holdings():
+    """Move the JSON portfolios of all users into Holding rows, returns the number of portfolios moved.
+    
+    Each portfolio is claimed by clearing its JSON column in the same
+    transaction that inserts its holdings, so workers starting at the same
+    time do not migrate a portfolio twice.
+    """
+    moved = 0
+    pending = db.session.query(PortfolioData.id, PortfolioData.user_id, PortfolioData.data) \
+        .filter(PortfolioData.data.isnot(None)).all()
+    for portfolio_id, user_id, data in pending:
+        try:
+            claimed = PortfolioData.query.filter(PortfolioData.id == portfolio_id, PortfolioData.data.isnot(None)) \
+                .update({'data': None}, synchronize_session=False)
+            if not claimed:
+                db.session.rollback()
+                continue
+            for asset_class, assets in json.loads(data).items():
+                for position, asset in enumerate(assets):
+                    db.session.add(Holding.from_asset(user_id, asset_class, asset, position))
+            db.session.commit()
+            moved += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error migrating portfolio {portfolio_id}: {e}")
+    return moved
+
+def get_all_portfolio_tickers():
+    """Collect the deduplicated set of tickers held in any user's portfolio"""
+    rows = db.session.query(Holding.ticker).filter(Holding.ticker.isnot(None), Holding.ticker != '',
+                                                   Holding.asset_class != 'savings').distinct()
+    return sorted(ticker for ticker, in rows)
+
+def get_all_portfolio_currencies():
+    """Collect the deduplicated set of currencies used in any user's portfolio"""
+    rows = db.session.query(Holding.currency).filter(Holding.currency.isnot(None), Holding.currency != '').distinct()
+    return sorted(currency for currency, in rows)
@@ -0,0 +1,431 @@
+import json
+import os
+import struct
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, locking becomes a no-op there
+    fcntl = None
+
+# Shared on-disk location for all ticker price data (app/cache)
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+
+# File layout: fixed 64-byte header followed by the columns.
+# The float64 columns come first so every column stays 8-byte aligned,
+# the int32 epoch-day dates are stored last. The last header field is the
+# time the rows were last written in full (0.0 in files from before it).
+MAGIC = b'GLPS'
+FORMAT_VERSION = 1
+HEADER_STRUCT = struct.Struct('<4sHHIiddd')
+HEADER_SIZE = 64
+FLOAT_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+FILE_SUFFIX = '.prices'
+
+# Header flags
+FLAG_CLOSE_ONLY = 1  # imported from a legacy cache without OHLCV columns
+
+EPOCH = date(1970, 1, 1)
+
+
+def date_to_epoch_day(value):
+    """Convert a date, datetime or 'YYYY-MM-DD' string to days since 1970-01-01"""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d').date()
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def epoch_day_to_str(day):
+    """Convert days since 1970-01-01 to a 'YYYY-MM-DD' string"""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def epoch_days_to_strings(days):
+    """Vectorized conversion of an epoch-day array to 'YYYY-MM-DD' strings"""
+    return np.datetime_as_string(np.asarray(days, dtype='int64').astype('datetime64[D]')).tolist()
+
+
+def frame_to_columns(history):
+    """Split a yfinance history DataFrame into (dates, open, high, low, close, volume) arrays"""
+    index = history.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    dates = index.values.astype('datetime64[D]').astype(np.int64)
+    rows = len(dates)
+
+    def column(name):
+        if name in history.columns:
+            return history[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.full(rows, np.nan)
+
+    return dates, column('Open'), column('High'), column('Low'), column('Close'), column('Volume')
+
+
+class PriceHeader:
+    """Small fixed-size header describing a stored price series"""
+
+    __slots__ = ('rows', 'last_date', 'last_close', 'fetch_time', 'flags', 'rewrite_time')
+
+    def __init__(self, rows, last_date, last_close, fetch_time, flags=0, rewrite_time=0.0):
+        self.rows = rows
+        self.last_date = last_date
+        self.last_close = last_close
+        self.fetch_time = fetch_time
+        self.flags = flags
+        # Changes whenever stored rows may have changed (full fetch, re-adjusted history), not on appends
+        self.rewrite_time = rewrite_time
+
+    @property
+    def last_date_str(self):
+        return epoch_day_to_str(self.last_date) if self.rows else None
+
+    @property
+    def fetch_time_str(self):
+        return datetime.fromtimestamp(self.fetch_time).strftime('%Y-%m-%d %H:%M:%S')
+
+    def age_seconds(self, now=None):
+        return (now if now is not None else time.time()) - self.fetch_time
+
+    def pack(self):
+        packed = HEADER_STRUCT.pack(MAGIC, FORMAT_VERSION, self.flags, self.rows,
+                                    self.last_date, self.last_close, self.fetch_time, self.rewrite_time)
+        return packed.ljust(HEADER_SIZE, b'\0')
+
+    @classmethod
+    def unpack(cls, raw):
+        magic, version, flags, rows, last_date, last_close, fetch_time, rewrite_time = HEADER_STRUCT.unpack_from(raw)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('Unknown price file format')
+        return cls(rows, last_date, last_close, fetch_time, flags, rewrite_time)
+
+
+class TickerLock:
+    """Exclusive per-ticker file lock (flock) shared by all gunicorn workers"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking=True, timeout=None):
+        """Acquire the lock, returns False if it is held elsewhere and we did not wait"""
+        if fcntl is None:
+            return True
+        self._file = open(self.path, 'a')
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.time() >= deadline):
+                    self._file.close()
+                    self._file = None
+                    return False
+                time.sleep(0.05)
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class PriceSeries:
+    """Read-only columnar view of one ticker's history backed by a memory map"""
+
+    def __init__(self, ticker, header, columns):
+        self.ticker = ticker
+        self.header = header
+        self.dates = columns['dates']
+        self.open = columns['open']
+        self.high = columns['high']
+        self.low = columns['low']
+        self.close = columns['close']
+        self.volume = columns['volume']
+
+    def __len__(self):
+        return self.header.rows
+
+    def index_range(self, start_day=None, end_day=None):
+        """Binary-search an inclusive epoch-day range, returns row positions (start, stop)"""
+        start = 0 if start_day is None else int(np.searchsorted(self.dates, start_day, side='left'))
+        stop = len(self) if end_day is None else int(np.searchsorted(self.dates, end_day, side='right'))
+        return start, stop
+
+    @property
+    def last_close(self):
+        return self.header.last_close
+
+    @property
+    def last_date(self):
+        return self.header.last_date_str
+
+    @property
+    def fetch_time(self):
+        return self.header.fetch_time_str
+
+    def to_dict(self):
+        """Columns and header values as a dict, dates as epoch days and columns as arrays"""
+        result = {
+            'ticker': self.ticker,
+            'dates': self.dates,
+            'values': self.close,
+            'last_close': self.last_close,
+            'last_date': self.last_date,
+            'last_datetime': f"{self.last_date} 17:30:00",
+            'fetch_time': self.fetch_time,
+            'full_history': True
+        }
+        # OHLCV columns are NaN when the source had no such data (e.g. imported legacy caches)
+        for name in ('open', 'high', 'low'):
+            column = getattr(self, name)
+            if len(column) and not np.isnan(column).all():
+                result[f'{name}_values'] = column
+        if len(self.volume) and not np.isnan(self.volume).all():
+            result['volume_values'] = np.nan_to_num(self.volume)
+        return result
+
+
+class PriceStore:
+    """Per-ticker fixed-width column files shared by all workers through the page cache"""
+
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_STORE_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def safe_name(ticker):
+        return ticker.replace('/', '_').replace(':', '_')
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{self.safe_name(ticker)}{FILE_SUFFIX}")
+
+    def legacy_path(self, ticker):
+        return os.path.join(self.root, f"{self.safe_name(ticker)}.json")
+
+    def lock(self, ticker):
+        """Return the cross-process lock guarding fetches of a ticker"""
+        return TickerLock(os.path.join(self.root, f"{self.safe_name(ticker)}.lock"))
+
+    def header(self, ticker):
+        """Read only the header of a ticker file - O(1) regardless of history length"""
+        path = self.path(ticker)
+        try:
+            with open(path, 'rb') as f:
+                return PriceHeader.unpack(f.read(HEADER_SIZE))
+        except FileNotFoundError:
+            if self._import_legacy(ticker):
+                return self.header(ticker)
+            return None
+        except (ValueError, struct.error) as e:
+            print(f"Error reading price header for {ticker}: {e}")
+            return None
+
+    def last_close(self, ticker):
+        """Return the last close price without touching the history columns"""
+        header = self.header(ticker)
+        return header.last_close if header else None
+
+    def load(self, ticker):
+        """Return a memory-mapped PriceSeries for a ticker, or None if nothing is stored"""
+        path = self.path(ticker)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if self._import_legacy(ticker):
+                return self.load(ticker)
+            return None
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._maps.get(ticker)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+        try:
+            series = self._map_file(ticker, path)
+        except (ValueError, struct.error, OSError) as e:
+            print(f"Error reading price file for {ticker}: {e}")
+            return None
+
+        with self._lock:
+            self._maps[ticker] = (key, series)
+        return series
+
+    def _map_file(self, ticker, path):
+        # One read-only map per file; the columns are zero-copy views into it
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        header = PriceHeader.unpack(raw[:HEADER_SIZE].tobytes())
+        rows = header.rows
+        columns = {}
+        offset = HEADER_SIZE
+        for name in FLOAT_COLUMNS:
+            columns[name] = raw[offset:offset + rows * 8].view(np.float64)
+            offset += rows * 8
+        columns['dates'] = raw[offset:offset + rows * 4].view(np.int32)
+        return PriceSeries(ticker, header, columns)
+
+    def write(self, ticker, dates, open_, high, low, close, volume, fetch_time=None, flags=0, rewrite_time=None):
+        """Write a full series for a ticker, replacing any existing file.
+
+        rewrite_time defaults to the fetch time, i.e. the rows count as rewritten.
+        """
+        dates = np.ascontiguousarray(dates, dtype=np.int32)
+        rows = len(dates)
+        columns = [np.ascontiguousarray(col, dtype=np.float64) for col in (open_, high, low, close, volume)]
+        for column in columns:
+            if len(column) != rows:
+                raise ValueError(f"Column length mismatch for {ticker}")
+
+        fetch_time = fetch_time if fetch_time is not None else time.time()
+        header = PriceHeader(
+            rows=rows,
+            last_date=int(dates[-1]) if rows else 0,
+            last_close=float(columns[3][-1]) if rows else 0.0,
+            fetch_time=fetch_time,
+            flags=flags,
+            rewrite_time=rewrite_time if rewrite_time is not None else fetch_time
+        )
+
+        # Write next to the target and rename, so existing memory maps keep
+        # pointing at the old inode instead of a truncated file
+        path = self.path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header.pack())
+            for column in columns:
+                f.write(column.tobytes())
+            f.write(dates.tobytes())
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._maps.pop(ticker, None)
+        return header
+
+    def write_frame(self, ticker, history, fetch_time=None, flags=0):
+        """Write a yfinance history DataFrame (DatetimeIndex, OHLCV columns)"""
+        return self.write(ticker, *frame_to_columns(history), fetch_time=fetch_time, flags=flags)
+
+    def append(self, ticker, dates, open_, high, low, close, volume, fetch_time=None):
+        """Merge new rows into a stored series.
+
+        Stored rows on or after the first new date are replaced, so a
+        partial intraday bar is overwritten by the final one. The rewrite
+        time is kept: the rows before the new dates are unchanged.
+        """
+        series = self.load(ticker)
+        if series is None or len(series) == 0:
+            return self.write(ticker, dates, open_, high, low, close, volume, fetch_time=fetch_time)
+
+        dates = np.asarray(dates, dtype=np.int32)
+        keep = int(np.searchsorted(series.dates, dates[0], side='left')) if len(dates) else len(series)
+        merged = [np.concatenate((old[:keep], np.asarray(new, dtype=old.dtype)))
+                  for old, new in ((series.dates, dates), (series.open, open_), (series.high, high),
+                                   (series.low, low), (series.close, close), (series.volume, volume))]
+        return self.write(ticker, *merged, fetch_time=fetch_time, flags=series.header.flags,
+                          rewrite_time=series.header.rewrite_time)
+
+    def delete(self, ticker):
+        """Remove the stored series for a ticker"""
+        with self._lock:
+            self._maps.pop(ticker, None)
+        for path in (self.path(ticker), self.legacy_path(ticker), self.failure_path(ticker)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def failure_path(self, ticker):
+        return os.path.join(self.root, f"{self.safe_name(ticker)}.failed")
+
+    def failure(self, ticker):
+        """Return the negative cache entry of a ticker ({failures, retry_at, error}) or None"""
+        try:
+            with open(self.failure_path(ticker), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            print(f"Error reading failure entry for {ticker}: {e}")
+            return None
+
+    def record_failure(self, ticker, error, base_delay, max_delay):
+        """Store a failed fetch with an exponentially growing retry delay"""
+        previous = self.failure(ticker)
+        failures = (previous or {}).get('failures', 0) + 1
+        # The exponent is capped so long failure streaks cannot overflow the float conversion
+        delay = min(base_delay * 2 ** min(failures - 1, 30), max_delay)
+        entry = {
+            'failures': failures,
+            'failed_at': time.time(),
+            'retry_at': time.time() + delay,
+            'error': str(error)
+        }
+        path = self.failure_path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return entry
+
+    def clear_failure(self, ticker):
+        try:
+            os.remove(self.failure_path(ticker))
+        except FileNotFoundError:
+            pass
+
+    def tickers(self):
+        """List all tickers that have a stored series"""
+        return sorted(name[:-len(FILE_SUFFIX)] for name in os.listdir(self.root) if name.endswith(FILE_SUFFIX))
+
+    def _import_legacy(self, ticker):
+        """Convert an old JSON cache file (dates/values lists) into the columnar format"""
+        legacy = self.legacy_path(ticker)
+        if not os.path.exists(legacy):
+            return False
+        try:
+            with open(legacy, 'r') as f:
+                data = json.load(f)
+            if data.get('error') or data.get('is_fallback') or not data.get('dates'):
+                return False
+
+            dates = np.array(data['dates'], dtype='datetime64[D]').astype(np.int64)
+            rows = len(dates)
+
+            def column(key):
+                values = data.get(key)
+                if values and len(values) == rows:
+                    return np.array(values, dtype=np.float64)
+                return np.full(rows, np.nan)
+
+            fetch_time = os.path.getmtime(legacy)
+            if data.get('fetch_time'):
+                fetch_time = datetime.strptime(data['fetch_time'], '%Y-%m-%d %H:%M:%S').timestamp()
+
+            self.write(ticker, dates, column('open_values'), column('high_values'), column('low_values'),
+                       column('values'), column('volume_values'), fetch_time=fetch_time,
+                       flags=0 if data.get('open_values') else FLAG_CLOSE_ONLY)
+            return True
+        except Exception as e:
+            print(f"Error importing legacy cache for {ticker}: {e}")
+            return False
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Return the process-wide PriceStore instance"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore(os.environ.get('PRICE_STORE_DIR'))
+    return _store
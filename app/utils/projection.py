@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Trading days per simulated month
+MONTH_DAYS = 21
+
+# Paths simulated per task; fixed so a seed gives the same result for any number of workers
+CHUNK_PATHS = 5000
+
+# Percentile bands returned for every month
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# bootstrap: resample historical monthly returns, normal: draw from a normal distribution fitted to them
+METHODS = ('bootstrap', 'normal')
+
+# Simulations smaller than this (paths x months) run in the calling process
+INLINE_MAX_CELLS = 200000
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def monthly_log_returns(daily_returns):
+    """Overlapping MONTH_DAYS-day log returns from a daily log return series (NaN days dropped)"""
+    daily_returns = np.asarray(daily_returns, dtype=np.float64)
+    daily_returns = daily_returns[~np.isnan(daily_returns)]
+    if len(daily_returns) < MONTH_DAYS:
+        return np.empty(0)
+    cumsum = np.cumsum(np.insert(daily_returns, 0, 0.0))
+    return cumsum[MONTH_DAYS:] - cumsum[:-MONTH_DAYS]
+
+
+def simulate_chunk(samples, method, months, start_value, contribution, paths, seed):
+    """Simulate `paths` monthly value paths, returns a (paths x months + 1) float32 array.
+
+    Each month the value grows by a sampled return and the contribution is
+    added at its end: V[t] = V[t - 1] * g[t] + c. With G the cumulative
+    growth this is V[t] = G[t] * (V[0] + c * sum(1 / G[1..t])), so the
+    paths are computed with two cumulative operations instead of a loop.
+    """
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        log_growth = rng.choice(samples, size=(paths, months))
+    else:
+        log_growth = rng.normal(samples.mean(), samples.std(ddof=1), size=(paths, months))
+    growth = np.exp(np.cumsum(log_growth, axis=1))
+
+    values = np.empty((paths, months + 1), dtype=np.float32)
+    values[:, 0] = start_value
+    values[:, 1:] = growth * (start_value + contribution * np.cumsum(1.0 / growth, axis=1))
+    return values
+
+
+def get_executor(workers):
+    """Process pool of this worker process, created on first use.
+
+    Uses spawned processes so no threads or database connections of the
+    web worker are inherited.
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def simulate(samples, method, months, start_value, contribution=0.0, paths=10000, seed=0, workers=1):
+    """Monte Carlo simulation of a value with monthly returns drawn from `samples`.
+
+    Paths are split into chunks of CHUNK_PATHS, each with its own child of
+    the seed, and the chunks are spread over a process pool. Returns the
+    PERCENTILES bands per month (len(PERCENTILES) x months + 1) and the
+    final values of all paths.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unbekannte Methode: {method}")
+    samples = np.asarray(samples, dtype=np.float64)
+    sizes = [min(CHUNK_PATHS, paths - start) for start in range(0, paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    arguments = [(samples, method, months, start_value, contribution, size, child)
+                 for size, child in zip(sizes, seeds)]
+
+    if workers > 1 and len(sizes) > 1 and paths * months > INLINE_MAX_CELLS:
+        chunks = list(get_executor(workers).map(simulate_chunk, *zip(*arguments)))
+    else:
+        chunks = [simulate_chunk(*args) for args in arguments]
+
+    values = np.vstack(chunks)
+    return np.percentile(values, PERCENTILES, axis=0), values[:, -1]
+
+
+def compound(value, annual_rate, months):
+    """Value of a balance with monthly compounding at an annual rate for 0..months months"""
+    return value * (1 + annual_rate / 12) ** np.arange(months + 1)
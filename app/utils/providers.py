@@ -0,0 +1,161 @@
+import os
+import random
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date
+from urllib.parse import parse_qsl
+import numpy as np
+import pandas as pd
+
+
+class PriceProvider(ABC):
+    """Source of daily OHLCV history.
+
+    download() takes a list of tickers and an optional start date
+    ('YYYY-MM-DD') and returns a dict of ticker -> DataFrame indexed by date
+    with Open/High/Low/Close/Volume columns. Tickers without data are left
+    out; the whole call may raise on transport errors.
+
+    rate/burst define the shared request budget (requests per second and
+    bucket size) that callers acquire before download(); None is unlimited.
+    """
+
+    name = 'base'
+    rate = None
+    burst = 1
+
+    @abstractmethod
+    def download(self, ticker_symbols, start=None):
+        """Return a dict of ticker -> OHLCV DataFrame from start (or the full history) on"""
+
+
+class YFinanceProvider(PriceProvider):
+    """Yahoo Finance through yfinance, one grouped download per call"""
+
+    name = 'yfinance'
+    # yfinance issues one request per ticker, budget shared by all workers
+    rate = 2.0
+    burst = 20
+
+    def download(self, ticker_symbols, start=None):
+        import yfinance as yf
+
+        ticker_symbols = list(ticker_symbols)
+        kwargs = {'start': start} if start is not None else {'period': 'max'}
+        data = yf.download(ticker_symbols, group_by='ticker', threads=True, auto_adjust=True,
+                           actions=False, progress=False, **kwargs)
+
+        result = {}
+        if not data.empty and data.columns.nlevels == 1:
+            # Older yfinance versions return flat columns for a single ticker
+            return {ticker_symbols[0]: data.dropna(how='all')}
+        for ticker_symbol in ticker_symbols:
+            if data.empty or ticker_symbol not in data.columns.get_level_values(0):
+                continue
+            # The grouped frame is aligned on the union of all trading days
+            result[ticker_symbol] = data[ticker_symbol].dropna(how='all')
+        return result
+
+
+class DirectoryProvider(PriceProvider):
+    """Local directory of <ticker>.parquet or <ticker>.csv files (e.g. saved yfinance history)"""
+
+    name = 'directory'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _read(self, ticker_symbol):
+        base = os.path.join(self.root, ticker_symbol.replace('/', '_').replace(':', '_'))
+        if os.path.exists(base + '.parquet'):
+            frame = pd.read_parquet(base + '.parquet')
+        elif os.path.exists(base + '.csv'):
+            frame = pd.read_csv(base + '.csv')
+        else:
+            return None
+        if 'Date' in frame.columns:
+            frame = frame.set_index('Date')
+        frame.index = pd.to_datetime(frame.index, utc=True).tz_localize(None)
+        return frame.sort_index()
+
+    def download(self, ticker_symbols, start=None):
+        result = {}
+        for ticker_symbol in ticker_symbols:
+            frame = self._read(ticker_symbol)
+            if frame is None:
+                continue
+            if start is not None:
+                frame = frame[frame.index >= pd.Timestamp(start)]
+            result[ticker_symbol] = frame
+        return result
+
+
+class SyntheticProvider(PriceProvider):
+    """Deterministic random-walk prices with configurable latency and failure rate.
+
+    Every ticker gets its own fixed series (derived from seed and ticker), so
+    repeated and incremental downloads agree with each other. Each column is
+    drawn from its own random stream, so a new business day only appends a
+    row and never changes the days before it.
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, seed=0, latency=0.0, failure_rate=0.0, start_date='2005-01-03', rate=None, burst=20):
+        self.seed = int(seed)
+        self.latency = float(latency)
+        self.failure_rate = float(failure_rate)
+        self.start_date = start_date
+        self.rate = float(rate) if rate is not None else None
+        self.burst = int(burst)
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def history(self, ticker_symbol):
+        """Full business-day history of a ticker up to today"""
+        index = pd.bdate_range(self.start_date, date.today(), name='Date')
+        key = zlib.crc32(ticker_symbol.encode())
+        base, returns, spread, gap, volume = (np.random.default_rng([self.seed, key, column]) for column in range(5))
+        close = (20 + 180 * base.random()) * np.exp(np.cumsum(returns.normal(0.0003, 0.012, len(index))))
+        spread = np.abs(spread.normal(0, 0.006, len(index)))
+        open_ = close * (1 + gap.normal(0, 0.004, len(index)))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + spread),
+            'Low': np.minimum(open_, close) * (1 - spread),
+            'Close': close,
+            'Volume': volume.integers(10000, 1000000, len(index)).astype(np.float64)
+        }, index=index)
+
+    def download(self, ticker_symbols, start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        result = {}
+        for ticker_symbol in ticker_symbols:
+            with self._lock:
+                failed = self._random.random() < self.failure_rate
+            if failed:
+                continue
+            frame = self.history(ticker_symbol)
+            if start is not None:
+                frame = frame[frame.index >= pd.Timestamp(start)]
+            result[ticker_symbol] = frame
+        return result
+
+
+def create_provider(spec):
+    """Build a provider from a config string.
+
+    'yfinance', 'directory:/path/to/files' or
+    'synthetic:seed=1&latency=0.2&failure_rate=0.05&rate=2&burst=10'
+    """
+    name, _, options = (spec or 'yfinance').partition(':')
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'directory':
+        return DirectoryProvider(options)
+    if name == 'synthetic':
+        return SyntheticProvider(**dict(parse_qsl(options)))
+    raise ValueError(f"Unknown price provider: {spec}")
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+from app.utils.price_store import get_price_store
+
+
+class TokenBucket:
+    """Token bucket shared by all worker processes through a small SQLite file.
+
+    Each named bucket refills at `rate` tokens per second up to `burst`.
+    acquire() waits until enough tokens are available (or fails at once with
+    timeout=0) and records how long callers had to wait, so the budgets can
+    be tuned from real numbers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets '
+                         '(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket_metrics '
+                         '(name TEXT PRIMARY KEY, acquired INTEGER NOT NULL DEFAULT 0, '
+                         'waited INTEGER NOT NULL DEFAULT 0, total_wait REAL NOT NULL DEFAULT 0, '
+                         'max_wait REAL NOT NULL DEFAULT 0, timeouts INTEGER NOT NULL DEFAULT 0)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _take(self, conn, name, tokens, rate, burst):
+        """Try to take tokens, returns the seconds to wait before they are available"""
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE name = ?', (name,)).fetchone()
+            available, updated = row if row else (burst, now)
+            available = min(burst, available + max(0.0, now - updated) * rate)
+            if available >= tokens:
+                available -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - available) / rate
+            conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                         (name, available, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, name, tokens=1, rate=1.0, burst=1, timeout=None):
+        """Block until `tokens` are available in the bucket, returns the seconds waited.
+
+        Returns None if the tokens would not be available within the timeout;
+        with timeout=0 that is decided without sleeping. Requests larger than
+        the burst size can never be granted and raise ValueError, callers
+        split them into smaller batches.
+        """
+        if tokens > burst:
+            raise ValueError(f"Cannot take {tokens} tokens from a bucket of {burst}")
+        waited = 0.0
+        with closing(self._connect()) as conn:
+            while True:
+                wait = self._take(conn, name, tokens, rate, burst)
+                if wait == 0:
+                    self._record(conn, name, waited)
+                    return waited
+                if timeout is not None and waited + wait > timeout:
+                    self._record(conn, name, None)
+                    return None
+                time.sleep(wait)
+                waited += wait
+
+    def _record(self, conn, name, waited):
+        conn.execute('INSERT OR IGNORE INTO bucket_metrics (name) VALUES (?)', (name,))
+        if waited is None:
+            conn.execute('UPDATE bucket_metrics SET timeouts = timeouts + 1 WHERE name = ?', (name,))
+        else:
+            conn.execute('UPDATE bucket_metrics SET acquired = acquired + 1, '
+                         'waited = waited + (? > 0), total_wait = total_wait + ?, '
+                         'max_wait = MAX(max_wait, ?) WHERE name = ?', (waited, waited, waited, name))
+
+    def metrics(self):
+        """Return wait-time metrics per bucket across all workers"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT m.name, m.acquired, m.waited, m.total_wait, m.max_wait, m.timeouts, '
+                                'b.tokens FROM bucket_metrics m LEFT JOIN buckets b ON b.name = m.name '
+                                'ORDER BY m.name').fetchall()
+        return {
+            name: {
+                'acquired': acquired,
+                'waited': waited,
+                'total_wait': round(total_wait, 3),
+                'avg_wait': round(total_wait / acquired, 3) if acquired else 0.0,
+                'max_wait': round(max_wait, 3),
+                'timeouts': timeouts,
+                'tokens': round(tokens, 2) if tokens is not None else None
+            }
+            for name, acquired, waited, total_wait, max_wait, timeouts, tokens in rows
+        }
+
+    def reset_metrics(self):
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM bucket_metrics')
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """Return the process-wide TokenBucket stored next to the price files"""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucket(os.path.join(get_price_store().root, 'rate_limits.sqlite3'))
+    return _limiter
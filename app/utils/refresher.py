@@ -0,0 +1,61 @@
+import os
+import queue
+import threading
+
+
+class BackgroundRefresher:
+    """Refreshes tickers on a daemon thread so requests can serve stale data.
+
+    Tickers submitted while a refresh is pending are ignored, and everything
+    queued at the time the worker wakes up is refreshed as one batch.
+    """
+
+    def __init__(self, refresh_func):
+        self.refresh_func = refresh_func
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._thread = None
+
+    def _ensure_thread(self):
+        # gunicorn forks workers after import, threads do not survive the fork
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='price-refresher', daemon=True)
+            self._thread.start()
+
+    def submit(self, ticker_symbols):
+        """Queue tickers for a background refresh, returns the newly queued ones"""
+        with self._lock:
+            self._ensure_thread()
+            queued = [ticker_symbol for ticker_symbol in ticker_symbols if ticker_symbol not in self._pending]
+            for ticker_symbol in queued:
+                self._pending.add(ticker_symbol)
+                self._queue.put(ticker_symbol)
+        return queued
+
+    def is_refreshing(self, ticker_symbol):
+        """Check if a background refresh is pending for a ticker"""
+        with self._lock:
+            return self._pid == os.getpid() and ticker_symbol in self._pending
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.refresh_func(batch)
+            except Exception as e:
+                print(f"Error in background refresh of {', '.join(batch)}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.difference_update(batch)
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """In-process LRU cache of computed results, bounded by their total size in bytes.
+
+    Entries belong to a group (e.g. user and ticker) that carries a version
+    (e.g. price fetch time and holdings timestamp). Looking up or storing a
+    group with a new version drops all of its entries stored under the old
+    one, so price updates and holding edits invalidate cached results.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # (group, key) -> (value, size)
+        self._versions = {}  # group -> version
+        self._counts = {}  # group -> number of entries
+        self._lock = threading.Lock()
+
+    def get(self, group, version, key):
+        """Return the cached value or None"""
+        with self._lock:
+            if self._versions.get(group) == version:
+                entry = self._entries.get((group, key))
+                if entry is not None:
+                    self._entries.move_to_end((group, key))
+                    return entry[0]
+            return None
+
+    def put(self, group, version, key, value, size):
+        """Store a value whose size in bytes is known, evicting the least recently used entries"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._versions.get(group) != version:
+                self._drop_group(group)
+                self._versions[group] = version
+            old = self._entries.pop((group, key), None)
+            if old is not None:
+                self.size -= old[1]
+            else:
+                self._counts[group] = self._counts.get(group, 0) + 1
+            self._entries[(group, key)] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                (old_group, _), (_, old_size) = self._entries.popitem(last=False)
+                self.size -= old_size
+                self._counts[old_group] -= 1
+                if not self._counts[old_group]:
+                    del self._counts[old_group]
+                    self._versions.pop(old_group, None)
+
+    def _drop_group(self, group):
+        if not self._counts.pop(group, 0):
+            return
+        for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == group]:
+            self.size -= self._entries.pop(entry_key)[1]
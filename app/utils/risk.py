@@ -0,0 +1,134 @@
+import numpy as np
+from app.utils.indicators import TRADING_DAYS
+
+# Default length of the rolling beta window in trading days (about three months)
+DEFAULT_BETA_WINDOW = 63
+
+# Rolling beta windows a client may request
+MIN_BETA_WINDOW = 20
+MAX_BETA_WINDOW = 756
+
+# All kernels take (dates x columns) matrices and reduce every column at once;
+# NaN marks days before a column's first price and is ignored.
+
+
+def log_return_matrix(prices):
+    """Daily log returns of every column, the first row and rows without a previous price are NaN"""
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.full(prices.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = np.diff(np.log(np.where(prices > 0, prices, np.nan)), axis=0)
+    return returns
+
+
+def annualized_volatility(returns):
+    """Sample standard deviation of daily log returns, annualized"""
+    counts = np.sum(~np.isnan(returns), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(returns, axis=0) / counts
+        variance = np.nansum((returns - mean) ** 2, axis=0) / (counts - 1)
+    return np.where(counts > 1, np.sqrt(variance * TRADING_DAYS), np.nan)
+
+
+def annualized_return(returns):
+    """Mean daily log return, annualized"""
+    counts = np.sum(~np.isnan(returns), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nansum(returns, axis=0) / counts * TRADING_DAYS
+
+
+def sharpe_ratio(returns, risk_free_rate=0.0):
+    """Annualized excess return over the annualized volatility"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (annualized_return(returns) - risk_free_rate) / annualized_volatility(returns)
+
+
+def sortino_ratio(returns, risk_free_rate=0.0):
+    """Annualized excess return over the annualized downside deviation below the risk-free rate"""
+    target = risk_free_rate / TRADING_DAYS
+    counts = np.sum(~np.isnan(returns), axis=0)
+    shortfall = np.minimum(returns - target, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        downside = np.sqrt(np.nansum(shortfall ** 2, axis=0) / counts * TRADING_DAYS)
+        return (annualized_return(returns) - risk_free_rate) / downside
+
+
+def max_drawdown(prices):
+    """Largest decline from a running peak of every column.
+
+    Returns (drawdown, peak_rows, trough_rows) with the drawdown as a
+    negative fraction and the row positions of its peak and trough;
+    columns without prices get NaN and -1.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    rows, columns = prices.shape
+    valid = ~np.isnan(prices)
+    peaks = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdowns = np.where(valid, prices / peaks - 1, 0.0)
+    trough_rows = drawdowns.argmin(axis=0)
+
+    # Row of the running peak at every row, read at each trough
+    at_peak = valid & (prices == peaks)
+    peak_index = np.where(at_peak, np.arange(rows)[:, None], 0)
+    np.maximum.accumulate(peak_index, axis=0, out=peak_index)
+    peak_rows = peak_index[trough_rows, np.arange(columns)]
+
+    drawdown = drawdowns[trough_rows, np.arange(columns)]
+    empty = ~valid.any(axis=0)
+    drawdown[empty] = np.nan
+    peak_rows[empty] = -1
+    trough_rows[empty] = -1
+    return drawdown, peak_rows, trough_rows
+
+
+def rolling_beta(returns, benchmark_returns, window):
+    """Rolling beta of every column against the benchmark over `window` days.
+
+    Windowed sums come from cumulative sums, so the cost does not depend on
+    the window length; windows with a missing return in a column or the
+    benchmark are NaN.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    benchmark = np.asarray(benchmark_returns, dtype=np.float64)[:, None]
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark)
+    x = np.where(valid, benchmark, 0.0)
+    y = np.where(valid, returns, 0.0)
+
+    def window_sum(values):
+        cumsum = np.cumsum(np.vstack([np.zeros((1, values.shape[1])), values]), axis=0)
+        return cumsum[window:] - cumsum[:-window]
+
+    result = np.full(returns.shape, np.nan)
+    if len(returns) < window:
+        return result
+    count = window_sum(valid.astype(np.float64))
+    sum_x, sum_y = window_sum(x), window_sum(y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = window_sum(x * y) / window - sum_x * sum_y / window ** 2
+        variance = window_sum(x * x) / window - (sum_x / window) ** 2
+        beta = covariance / variance
+    result[window - 1:] = np.where(count == window, beta, np.nan)
+    return result
+
+
+def correlation_matrix(returns):
+    """Pairwise correlation of the columns over the days both have a return.
+
+    Computed with matrix products over the masked returns, so all pairs
+    are done in one pass even when the histories start on different days.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    valid = (~np.isnan(returns)).astype(np.float64)
+    values = np.where(valid > 0, returns, 0.0)
+
+    counts = valid.T @ valid
+    sums = values.T @ valid  # sums[i, j]: sum of column i over the days both i and j have a return
+    squares = (values * values).T @ valid
+    products = values.T @ values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = products / counts - sums * sums.T / counts ** 2
+        variance_i = squares / counts - (sums / counts) ** 2
+        correlation = covariance / np.sqrt(variance_i * variance_i.T)
+    correlation[counts < 2] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
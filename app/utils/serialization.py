@@ -0,0 +1,203 @@
+import gzip
+import importlib.util
+import json
+import numpy as np
+from flask import current_app, has_app_context
+from app.utils.price_store import epoch_days_to_strings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# pyarrow is large and slow to import, it is only loaded for Arrow responses
+HAS_ARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Response formats:
+#   json     the original layout, ISO date strings and full float precision
+#   compact  columnar JSON, dates as a start epoch day plus day deltas, rounded values
+#   msgpack  the compact layout as MessagePack
+#   arrow    an Arrow IPC stream with one column per series, scalars in the schema metadata
+MIMETYPES = {
+    'json': 'application/json',
+    'compact': 'application/json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+ACCEPT_FORMATS = {
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.apache.arrow.stream': 'arrow'
+}
+
+# Decimal places of rounded values (TIMESERIES_PRECISION)
+DEFAULT_PRECISION = 4
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+
+def format_available(fmt):
+    if fmt == 'msgpack':
+        return msgpack is not None
+    if fmt == 'arrow':
+        return HAS_ARROW
+    return fmt in MIMETYPES
+
+
+def negotiate(request, requested=None):
+    """Pick (format, content encoding) for a request.
+
+    An explicit format (request parameter) wins over the Accept header;
+    brotli is preferred over gzip if the client accepts both. msgpack and
+    Arrow are only offered when installed; pyarrow is an optional extra
+    (see requirements.txt), without it format=arrow is rejected.
+    """
+    fmt = requested or request.args.get('format')
+    if fmt:
+        if not format_available(fmt):
+            raise ValueError(f"Nicht unterstütztes Format: {fmt}")
+    else:
+        offers = ['application/json'] + [mimetype for mimetype, name in ACCEPT_FORMATS.items()
+                                          if format_available(name)]
+        fmt = ACCEPT_FORMATS.get(request.accept_mimetypes.best_match(offers), 'json')
+
+    encoding = None
+    if brotli is not None and request.accept_encodings.quality('br') > 0:
+        encoding = 'br'
+    elif request.accept_encodings.quality('gzip') > 0:
+        encoding = 'gzip'
+    return fmt, encoding
+
+
+def get_precision():
+    if has_app_context():
+        return current_app.config.get('TIMESERIES_PRECISION', DEFAULT_PRECISION)
+    return DEFAULT_PRECISION
+
+
+def to_columnar(payload, precision):
+    """Compact layout: epoch-day start plus deltas instead of dates, rounded float arrays"""
+    result = {}
+    for key, value in payload.items():
+        if key == 'dates':
+            dates = np.asarray(value, dtype=np.int64)
+            result['date_start'] = int(dates[0]) if len(dates) else None
+            result['date_deltas'] = np.diff(dates)
+        elif isinstance(value, np.ndarray):
+            result[key] = np.round(np.asarray(value, dtype=np.float64), precision)
+        elif isinstance(value, dict):
+            result[key] = to_columnar(value, precision)
+        else:
+            result[key] = value
+    return result
+
+
+def to_plain(value):
+    """Convert arrays to lists with None for NaN, for encoders without NumPy support"""
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        if value.ndim > 1:
+            return [to_plain(row) for row in value]
+        if value.dtype.kind == 'f':
+            return [None if item != item else item for item in value.tolist()]
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _orjson_default(value):
+    # Memory-mapped columns are ndarray subclasses, orjson only serializes plain ndarrays
+    if isinstance(value, np.ndarray):
+        return np.ascontiguousarray(value).view(np.ndarray)
+    return to_plain(value)
+
+
+def dumps_json(payload):
+    """Serialize to JSON bytes with orjson (NaN becomes null), falling back to the json module"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY, default=_orjson_default)
+    return json.dumps(to_plain(payload), separators=(',', ':')).encode()
+
+
+def dumps_arrow(payload, precision):
+    """Arrow IPC stream: equal-length arrays become columns, everything else schema metadata.
+
+    Matrices (one row per date) become one column per matrix column,
+    named '<key>.<column number>'.
+    """
+    import pyarrow as pa
+
+    dates = np.asarray(payload.get('dates', []), dtype=np.int64)
+    columns = {'date': pa.array(dates.astype(np.int32), type=pa.date32())}
+    metadata = {}
+    for key, value in payload.items():
+        if key == 'dates':
+            continue
+        if isinstance(value, dict) and value and all(isinstance(item, np.ndarray) for item in value.values()):
+            for name, column in value.items():
+                columns[f'{key}.{name}'] = np.round(np.asarray(column, dtype=np.float64), precision)
+        elif isinstance(value, np.ndarray) and value.ndim == 2 and len(value) == len(dates):
+            for number in range(value.shape[1]):
+                columns[f'{key}.{number}'] = np.round(np.asarray(value[:, number], dtype=np.float64), precision)
+        elif isinstance(value, np.ndarray) and len(value) == len(dates):
+            columns[key] = np.round(np.asarray(value, dtype=np.float64), precision)
+        else:
+            metadata[key] = value
+    table = pa.table(columns).replace_schema_metadata({'meta': dumps_json(metadata)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload, fmt):
+    """Serialize a payload whose 'dates' is an epoch-day array and columns are NumPy arrays"""
+    if fmt == 'json':
+        if isinstance(payload.get('dates'), np.ndarray):
+            payload = dict(payload, dates=epoch_days_to_strings(payload['dates']))
+        return dumps_json(payload)
+    precision = get_precision()
+    if fmt == 'arrow':
+        return dumps_arrow(payload, precision)
+    columns = to_columnar(payload, precision)
+    if fmt == 'msgpack':
+        return msgpack.packb(to_plain(columns))
+    return dumps_json(columns)
+
+
+def compress(body, encoding):
+    """Compress a body, returns (body, content encoding or None)"""
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=4), 'br'
+    return gzip.compress(body, compresslevel=5), 'gzip'
+
+
+def render(payload, fmt, encoding):
+    """Encode and compress a payload, returns (body, mimetype, content encoding)"""
+    body, content_encoding = compress(encode(payload, fmt), encoding)
+    return body, MIMETYPES[fmt], content_encoding
+
+
+def make_body_response(body, mimetype, content_encoding, status=200):
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,190 @@
+import copy
+import numpy as np
+from flask import g
+from app.models import DERIVED_FIELDS
+from app.utils.fx import get_base_currency, fx_tickers_for, rates_from_prices
+from app.utils.market_data import get_price_headers
+from app.utils.result_cache import ResultCache
+
+# Memory bound for the valuations kept per worker, and the size estimate per asset
+VALUATION_CACHE_MAX_BYTES = 4 * 1024 * 1024
+VALUATION_ASSET_BYTES = 2048
+
+# How each asset class is valued, in display order:
+#   market   latest close x amount in the base currency, for assets with a ticker and amount
+#   cost     acquisition cost (no market price)
+#   balance  the amount itself in the base currency
+# Acquisition costs are always stored in the base currency (the forms ask for them in it),
+# so cost-valued assets need no FX conversion and gains compare base-currency values.
+ASSET_CLASSES = [
+    ('etf', 'ETF', 'market'),
+    ('stocks', 'Aktien', 'market'),
+    ('bonds', 'Anleihen', 'cost'),
+    ('commodities', 'Rohstoffe', 'cost'),
+    ('realEstate', 'Immobilien', 'cost'),
+    ('savings', 'Sparguthaben', 'balance')
+]
+
+valuation_cache = ResultCache(VALUATION_CACHE_MAX_BYTES)
+
+
+def asset_rows(portfolio_data):
+    """All assets of the valued classes as (class index, asset) pairs in display order"""
+    return [(class_index, asset)
+            for class_index, (asset_class, _, _) in enumerate(ASSET_CLASSES)
+            for asset in portfolio_data.get(asset_class) or []]
+
+
+class PortfolioValuator:
+    """Values a whole portfolio in one columnar pass.
+
+    All assets are flattened into arrays (amount, acquisition cost, price,
+    FX rate), the prices of every ticker and currency across all classes
+    are resolved in one batch, and values, gains, class totals, allocation
+    and the performance chart data are computed with array operations.
+    """
+
+    def __init__(self, portfolio_data, base_currency=None):
+        self.portfolio_data = portfolio_data
+        self.base_currency = base_currency or get_base_currency()
+
+    def tickers(self):
+        """Every price ticker the valuation needs: the assets' own and the FX pairs"""
+        assets = [asset for _, asset in asset_rows(self.portfolio_data)]
+        tickers = sorted({asset['ticker'] for asset in assets if asset.get('ticker')})
+        return tickers + fx_tickers_for([asset.get('currency') or self.base_currency for asset in assets],
+                                        self.base_currency)
+
+    def run(self, headers=None):
+        """Return the valuation as a dict, the input portfolio data is left unchanged.
+
+        headers are the price headers of tickers(); they are fetched in one
+        batch if not given.
+        """
+        # Alle Kurse und Wechselkurse in einem Durchgang aus dem Cache holen
+        if headers is None:
+            headers = get_price_headers(self.tickers())
+        prices = {ticker: header.last_close if header else 0 for ticker, header in headers.items()}
+
+        # Derived fields stored by older versions are dropped and computed anew
+        portfolio = copy.deepcopy(self.portfolio_data)
+        rows = asset_rows(portfolio)
+        for _, asset in rows:
+            for name in DERIVED_FIELDS:
+                asset.pop(name, None)
+        assets = [asset for _, asset in rows]
+        class_index = np.array([index for index, _ in rows], dtype=np.int64)
+        method = np.array([ASSET_CLASSES[index][2] for index, _ in rows], dtype=object)
+        currencies = [asset.get('currency') or self.base_currency for asset in assets]
+        fx_rates = rates_from_prices(currencies, prices, self.base_currency)
+
+        amount = np.array([float(asset.get('amount') or 0) for asset in assets])
+        has_cost = np.array([asset.get('acquisition_cost') is not None for asset in assets], dtype=bool)
+        cost = np.array([float(asset.get('acquisition_cost') or 0) for asset in assets])
+        price = np.array([float(prices.get(asset.get('ticker'), 0) or 0) for asset in assets])
+        fx_rate = np.array([fx_rates[currency] for currency in currencies], dtype=np.float64)
+        # Assets in a currency without an FX rate are left out instead of being counted one to one
+        fx_missing = np.isnan(fx_rate)
+        missing_fx_rates = sorted({currency for currency, missing in zip(currencies, fx_missing) if missing})
+        fx_rate = np.nan_to_num(fx_rate)
+        has_ticker = np.array([bool(asset.get('ticker')) for asset in assets], dtype=bool)
+
+        market = method == 'market'
+        balance = method == 'balance'
+        # Savings without an acquisition cost count their balance, converted to the base currency, as cost
+        cost = np.where(balance & ~has_cost, amount * fx_rate, cost)
+        # Market assets are only valued with a ticker and an amount, cost-valued ones need both fields
+        valued = ((market & has_ticker & (amount > 0)) | balance) & ~fx_missing
+        counted = (market | balance | ((method == 'cost') & has_cost &
+                                       np.array(['amount' in asset for asset in assets], dtype=bool))) & \
+            ~(fx_missing & (market | balance))
+
+        value = np.select([market, balance], [price * amount * fx_rate, amount * fx_rate], cost)
+        value = np.where(valued | (method == 'cost'), value, 0.0) * counted
+        gain_loss = value - cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gain_loss_percent = np.where(cost > 0, gain_loss / cost * 100, 0.0)
+
+        # Klassensummen; Sparguthaben zählen ab einem Wert > 0, die übrigen ab Einstandskosten > 0
+        class_values = np.bincount(class_index, weights=value, minlength=len(ASSET_CLASSES))
+        class_costs = np.bincount(class_index, weights=cost * counted, minlength=len(ASSET_CLASSES))
+        included = np.array([class_values[i] > 0 if kind == 'balance' else class_costs[i] > 0
+                             for i, (_, _, kind) in enumerate(ASSET_CLASSES)], dtype=bool)
+        total_value = float(class_values[included].sum())
+        total_acquisition_cost = float(class_costs[included].sum())
+        total_gain_loss = total_value - total_acquisition_cost
+
+        asset_allocation = {}
+        if total_value > 0:
+            asset_allocation = {label: float(class_values[i]) / total_value * 100
+                                for i, (_, label, _) in enumerate(ASSET_CLASSES) if included[i]}
+
+        performance_data = {'labels': [], 'acquisition_costs': [], 'current_values': [], 'gains_losses': []}
+        holdings = {}
+        for i, asset in enumerate(assets):
+            if asset.get('ticker') and asset['ticker'] not in holdings:
+                holdings[asset['ticker']] = {
+                    'asset_class': ASSET_CLASSES[class_index[i]][0],
+                    'price': float(price[i]),
+                    'fx_rate': None if fx_missing[i] else float(fx_rate[i]),
+                    'market_value': None if fx_missing[i] else float(price[i] * amount[i] * fx_rate[i])
+                }
+            if not valued[i]:
+                continue
+            if market[i]:
+                asset['current_price'] = round(float(price[i]), 2)
+            else:
+                asset['interest_rate'] = asset.get('interest_rate') or 0
+                asset['acquisition_cost'] = float(cost[i]) if not has_cost[i] else asset['acquisition_cost']
+            asset['current_value'] = round(float(value[i]), 2)
+            asset['gain_loss'] = round(float(gain_loss[i]), 2)
+            asset['gain_loss_percent'] = round(float(gain_loss_percent[i]), 2)
+            if cost[i] > 0:
+                performance_data['labels'].append(asset.get('name') or asset.get('ticker') or 'Savings')
+                performance_data['acquisition_costs'].append(round(float(cost[i]), 2))
+                performance_data['current_values'].append(round(float(value[i]), 2))
+                performance_data['gains_losses'].append(round(float(gain_loss[i]), 2))
+
+        return {
+            'portfolio': portfolio,
+            'base_currency': self.base_currency,
+            'total_value': total_value,
+            'total_acquisition_cost': total_acquisition_cost,
+            'total_gain_loss': total_gain_loss,
+            'total_gain_loss_percent': total_gain_loss / total_acquisition_cost * 100 if total_acquisition_cost > 0 else 0,
+            'asset_allocation': asset_allocation,
+            'class_values': {label: float(class_values[i])
+                             for i, (_, label, _) in enumerate(ASSET_CLASSES) if included[i]},
+            'performance_data': performance_data,
+            'holdings': holdings,
+            'missing_fx_rates': missing_fx_rates
+        }
+
+
+def get_valuation(load_portfolio_data, user_id=None, holdings_version=None):
+    """Valuation of the current user's portfolio, computed once per request.
+
+    load_portfolio_data is only called on the first use; later calls in the
+    same request (e.g. several views of one page) reuse the result kept on
+    flask.g. With a user_id and holdings_version (the time of the last
+    portfolio edit) the result is also kept in valuation_cache until the
+    holdings, the base currency or one of the prices used change, so page
+    views without changes skip the valuation. The returned dict is shared
+    and must not be modified.
+    """
+    if 'portfolio_valuation' not in g:
+        valuator = PortfolioValuator(load_portfolio_data())
+        headers = get_price_headers(valuator.tickers())
+        if user_id is None or holdings_version is None:
+            g.portfolio_valuation = valuator.run(headers)
+            return g.portfolio_valuation
+        version = (holdings_version, valuator.base_currency,
+                   tuple((ticker, header.fetch_time, header.last_close) if header else ticker
+                         for ticker, header in headers.items()))
+        valuation = valuation_cache.get(user_id, version, 'valuation')
+        if valuation is None:
+            valuation = valuator.run(headers)
+            valuation_cache.put(user_id, version, 'valuation', valuation,
+                                VALUATION_ASSET_BYTES * (len(asset_rows(valuation['portfolio'])) + 1))
+        g.portfolio_valuation = valuation
+    return g.portfolio_valuation
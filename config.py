@@ -3,4 +3,23 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-gab-lab-finance'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///gab_lab_finance.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Market data source: 'yfinance', 'directory:/path' or 'synthetic:seed=1&latency=0.2&failure_rate=0.05'
+    PRICE_PROVIDER = os.environ.get('PRICE_PROVIDER') or 'yfinance'
+    
+    # Stale market data younger than this is served while it is refreshed in the background
+    PRICE_CACHE_HARD_MAX_AGE_HOURS = float(os.environ.get('PRICE_CACHE_HARD_MAX_AGE_HOURS') or 72)
+    
+    # Currency all portfolio values are converted to
+    BASE_CURRENCY = os.environ.get('BASE_CURRENCY') or 'EUR'
+    
+    # Decimal places of values in compact/binary timeseries responses
+    TIMESERIES_PRECISION = int(os.environ.get('TIMESERIES_PRECISION') or 4)
+    
+    # Default benchmark ticker and annual risk-free rate of /portfolio/risk
+    RISK_BENCHMARK = os.environ.get('RISK_BENCHMARK') or 'EUNL.DE'
+    RISK_FREE_RATE = float(os.environ.get('RISK_FREE_RATE') or 0.0)
+    
+    # Processes used for Monte Carlo projections (1 runs them in the web worker)
+    PROJECTION_WORKERS = int(os.environ.get('PROJECTION_WORKERS') or min(4, os.cpu_count() or 1))
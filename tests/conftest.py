@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import app.utils.market_data as market_data
+from app import create_app, db
+from app.utils.price_store import PriceStore
+from app.utils.providers import SyntheticProvider
+from config import Config
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Empty price store in a temporary directory, used by market_data as well"""
+    price_store = PriceStore(str(tmp_path / 'prices'))
+    monkeypatch.setattr(market_data, 'get_price_store', lambda: price_store)
+    return price_store
+
+
+@pytest.fixture
+def provider():
+    return SyntheticProvider(seed=1)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application with its own SQLite database and price store"""
+    monkeypatch.setenv('PRICE_STORE_DIR', str(tmp_path / 'prices'))
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        PRICE_PROVIDER = 'synthetic:seed=1'
+        WTF_CSRF_ENABLED = False
+
+    test_app = create_app(TestConfig)
+    with test_app.app_context():
+        yield test_app
+        db.session.remove()
+
+
+@pytest.fixture
+def close_prices():
+    """Random walk of positive closes, long enough to span several EWMA blocks"""
+    rng = np.random.default_rng(7)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 700)))
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from app.utils.downsample import MIN_POINTS, lttb_indices, parse_max_points
+
+
+def reference_lttb(x, y, threshold):
+    """Plain Largest-Triangle-Three-Buckets, one triangle at a time"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+
+    def edge(bucket):
+        # Buckets 0..threshold-3 split the inner points, the last point is a bucket of its own
+        if bucket >= threshold - 2:
+            return n - 1 if bucket == threshold - 2 else n
+        return int(bucket * every) + 1
+
+    selected = [0]
+    for i in range(threshold - 2):
+        previous = selected[-1]
+        average_x = np.mean(x[edge(i + 1):edge(i + 2)])
+        average_y = np.mean(y[edge(i + 1):edge(i + 2)])
+        areas = [abs((x[previous] - average_x) * (y[j] - y[previous])
+                     - (x[previous] - x[j]) * (average_y - y[previous])) for j in range(edge(i), edge(i + 1))]
+        selected.append(edge(i) + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+@pytest.fixture
+def walk():
+    rng = np.random.default_rng(3)
+    return np.arange(5000, dtype=np.float64), np.cumsum(rng.normal(size=5000))
+
+
+def test_lttb_keeps_endpoints_and_order(walk):
+    x, y = walk
+    keep = lttb_indices(x, y, 300)
+
+    assert len(keep) == 300
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_matches_reference(walk):
+    x, y = walk
+    for threshold in (10, 97, 300):
+        np.testing.assert_array_equal(lttb_indices(x, y, threshold), reference_lttb(x, y, threshold))
+
+
+def test_lttb_keeps_spikes():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    y[712] = -50.0
+
+    keep = lttb_indices(x, y, 20)
+    assert 437 in keep and 712 in keep
+
+
+def test_lttb_short_series_unchanged(walk):
+    x, y = walk
+    np.testing.assert_array_equal(lttb_indices(x[:50], y[:50], 100), np.arange(50))
+
+
+def test_parse_max_points():
+    assert parse_max_points(None) is None
+    assert parse_max_points('0') is None
+    assert parse_max_points('500') == 500
+    with pytest.raises(ValueError):
+        parse_max_points('abc')
+    with pytest.raises(ValueError):
+        parse_max_points(MIN_POINTS - 1)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.indicators import TRADING_DAYS, compute_indicator, get_indicator
+
+
+def assert_matches(values, reference):
+    np.testing.assert_allclose(values, np.asarray(reference, dtype=np.float64), rtol=1e-9, atol=1e-9)
+
+
+def wilder_mean(values, window):
+    """Wilder's smoothing as pandas computes it: alpha 1/window, first value as the seed"""
+    return values.ewm(alpha=1.0 / window, adjust=False).mean()
+
+
+def test_sma(close_prices):
+    values, params = compute_indicator('sma', {'close': close_prices}, {'window': 30})
+    assert params == {'window': 30}
+    assert_matches(values, pd.Series(close_prices).rolling(30).mean())
+
+
+def test_ema(close_prices):
+    values, _ = compute_indicator('ema', {'close': close_prices}, {'window': 20})
+    assert_matches(values, pd.Series(close_prices).ewm(span=20, adjust=False).mean())
+
+
+def test_bollinger(close_prices):
+    values, _ = compute_indicator('bollinger', {'close': close_prices}, {'window': 20, 'std_dev': 2.5})
+    close = pd.Series(close_prices)
+    middle = close.rolling(20).mean()
+    std = close.rolling(20).std()
+    assert_matches(values['middle'], middle)
+    assert_matches(values['upper'], middle + 2.5 * std)
+    assert_matches(values['lower'], middle - 2.5 * std)
+
+
+def test_rsi(close_prices):
+    values, _ = compute_indicator('rsi', {'close': close_prices}, {'window': 14})
+    change = pd.Series(close_prices).diff().iloc[1:]
+    gain = wilder_mean(change.clip(lower=0), 14)
+    loss = wilder_mean((-change).clip(lower=0), 14)
+    reference = (100 - 100 / (1 + gain / loss)).reindex(range(len(close_prices)))
+    reference[:14] = np.nan
+    assert_matches(values, reference)
+
+
+def test_macd(close_prices):
+    values, _ = compute_indicator('macd', {'close': close_prices})
+    close = pd.Series(close_prices)
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    assert_matches(values['macd'], macd)
+    assert_matches(values['signal'], signal)
+    assert_matches(values['histogram'], macd - signal)
+
+
+def test_atr(close_prices):
+    rng = np.random.default_rng(11)
+    high = close_prices * (1 + rng.uniform(0, 0.02, len(close_prices)))
+    low = close_prices * (1 - rng.uniform(0, 0.02, len(close_prices)))
+    values, _ = compute_indicator('atr', {'close': close_prices, 'high': high, 'low': low}, {'window': 10})
+
+    frame = pd.DataFrame({'high': high, 'low': low, 'previous': pd.Series(close_prices).shift()})
+    true_range = pd.concat([frame['high'] - frame['low'],
+                            (frame['high'] - frame['previous']).abs(),
+                            (frame['low'] - frame['previous']).abs()], axis=1).max(axis=1).iloc[1:]
+    reference = wilder_mean(true_range, 10).reindex(range(len(close_prices)))
+    reference[:10] = np.nan
+    assert_matches(values, reference)
+
+
+def test_volatility(close_prices):
+    values, _ = compute_indicator('volatility', {'close': close_prices}, {'window': 20})
+    log_returns = np.log(pd.Series(close_prices)).diff()
+    assert_matches(values, log_returns.rolling(20).std() * np.sqrt(TRADING_DAYS) * 100)
+
+
+def test_drawdown(close_prices):
+    values, _ = compute_indicator('drawdown', {'close': close_prices})
+    close = pd.Series(close_prices)
+    assert_matches(values, (close / close.cummax() - 1) * 100)
+
+
+def test_cached_result_reused(close_prices):
+    first, _ = compute_indicator('sma', {'close': close_prices}, {'window': 15}, cache_key=('AAA', 1.0, 700))
+    second, _ = compute_indicator('sma', {'close': close_prices}, {'window': '15'}, cache_key=('AAA', 1.0, 700))
+    assert second is first
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        get_indicator('unknown')
+    with pytest.raises(ValueError):
+        get_indicator('sma').resolve_params({'window': 1})
+    with pytest.raises(ValueError):
+        get_indicator('bollinger').resolve_params({'std_dev': 'wide'})
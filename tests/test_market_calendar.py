@@ -0,0 +1,25 @@
+from datetime import date
+import pytest
+from app.utils.market_calendar import NYSE, XETRA, calendar_for_ticker, easter_sunday
+
+
+@pytest.mark.parametrize('year, expected', [
+    (1961, date(1961, 4, 2)), (2008, date(2008, 3, 23)), (2011, date(2011, 4, 24)),
+    (2024, date(2024, 3, 31)), (2025, date(2025, 4, 20)), (2038, date(2038, 4, 25))
+])
+def test_easter_sunday(year, expected):
+    assert easter_sunday(year) == expected
+
+
+def test_easter_holidays():
+    # Easter 2026 is on April 5th
+    assert not XETRA.is_trading_day(date(2026, 4, 3))
+    assert not XETRA.is_trading_day(date(2026, 4, 6))
+    assert XETRA.is_trading_day(date(2026, 4, 7))
+    assert not NYSE.is_trading_day(date(2026, 4, 3))
+    assert NYSE.is_trading_day(date(2026, 4, 6))
+
+
+def test_calendar_for_ticker():
+    assert calendar_for_ticker('EUNL.DE') is XETRA
+    assert calendar_for_ticker('AAPL') is NYSE
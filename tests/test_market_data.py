@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from app.utils.market_data import (NO_DATA, apply_incremental, can_update_incrementally, incremental_start)
+
+
+def stored_with_window(store, provider, ticker, missing=3):
+    """Store a history without its last rows, return (stored series, full history, download window)"""
+    history = provider.history(ticker)
+    store.write_frame(ticker, history.iloc[:-missing], fetch_time=1000.0)
+    series = store.load(ticker)
+    window = history[history.index >= pd.Timestamp(incremental_start(series))]
+    return series, history, window
+
+
+def test_apply_incremental_appends_new_days(store, provider):
+    series, history, window = stored_with_window(store, provider, 'AAA')
+    assert can_update_incrementally(series)
+
+    header = apply_incremental('AAA', series, window)
+
+    assert header.rows == len(history)
+    assert header.rewrite_time == 1000.0
+    extended = store.load('AAA')
+    np.testing.assert_allclose(extended.close, history['Close'].to_numpy())
+
+
+def test_apply_incremental_detects_adjusted_history(store, provider):
+    series, _, window = stored_with_window(store, provider, 'AAA')
+    adjusted = window.copy()
+    adjusted[['Open', 'High', 'Low', 'Close']] *= 0.5
+
+    assert apply_incremental('AAA', series, adjusted) is None
+    # The stored rows are left for the full refetch
+    assert store.header('AAA').rows == len(series)
+
+
+def test_apply_incremental_empty_download(store, provider):
+    series, _, window = stored_with_window(store, provider, 'AAA')
+
+    assert apply_incremental('AAA', series, window.iloc[:0]) is NO_DATA
+    assert apply_incremental('AAA', series, None) is NO_DATA
+    assert store.header('AAA').fetch_time == 1000.0
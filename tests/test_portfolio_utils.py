@@ -0,0 +1,61 @@
+import json
+from app import db
+from app.models import Holding, PortfolioData, User
+from app.utils.portfolio_utils import get_all_portfolio_tickers, migrate_portfolio_holdings
+
+LEGACY_PORTFOLIO = {
+    'etf': [
+        {'name': 'World', 'ticker': 'EUNL.DE', 'isin': 'IE00B4L5Y983', 'currency': 'EUR',
+         'amount': 10, 'acquisition_cost': 700, 'current_value': 800, 'gain_loss': 100},
+        {'name': 'EM', 'ticker': 'IS3N.DE', 'currency': 'EUR', 'amount': 5, 'acquisition_cost': 150}
+    ],
+    'stocks': [{'name': 'Apple', 'ticker': 'AAPL', 'currency': 'USD', 'amount': 2, 'acquisition_cost': 300}],
+    'savings': [{'name': 'Tagesgeld', 'currency': 'EUR', 'amount': 1000, 'interest_rate': 0.02}]
+}
+
+
+def add_legacy_portfolio(username, portfolio):
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(PortfolioData(user_id=user.id, data=json.dumps(portfolio)))
+    db.session.commit()
+    return user
+
+
+def test_migrate_moves_json_into_holdings(app):
+    user = add_legacy_portfolio('anna', LEGACY_PORTFOLIO)
+
+    assert migrate_portfolio_holdings() == 1
+
+    portfolio = PortfolioData.query.filter_by(user_id=user.id).one()
+    assert portfolio.data is None
+    data = portfolio.get_data()
+    assert [asset['name'] for asset in data['etf']] == ['World', 'EM']
+    assert data['stocks'][0]['ticker'] == 'AAPL'
+    assert data['savings'][0]['interest_rate'] == 0.02
+    assert 'ticker' not in data['savings'][0]
+    # Derived fields of the old documents are not stored
+    assert 'current_value' not in data['etf'][0]
+    assert Holding.query.filter_by(user_id=user.id).count() == 4
+    assert get_all_portfolio_tickers() == ['AAPL', 'EUNL.DE', 'IS3N.DE']
+
+
+def test_migrate_runs_once(app):
+    user = add_legacy_portfolio('ben', LEGACY_PORTFOLIO)
+
+    assert migrate_portfolio_holdings() == 1
+    assert migrate_portfolio_holdings() == 0
+    assert Holding.query.filter_by(user_id=user.id).count() == 4
+
+
+def test_migrate_keeps_other_portfolios_on_error(app):
+    broken = add_legacy_portfolio('carl', LEGACY_PORTFOLIO)
+    PortfolioData.query.filter_by(user_id=broken.id).update({'data': 'not json'})
+    db.session.commit()
+    user = add_legacy_portfolio('dora', {'etf': LEGACY_PORTFOLIO['etf']})
+
+    assert migrate_portfolio_holdings() == 1
+    assert Holding.query.filter_by(user_id=user.id).count() == 2
+    assert PortfolioData.query.filter_by(user_id=broken.id).one().data == 'not json'
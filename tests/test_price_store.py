@@ -0,0 +1,66 @@
+import numpy as np
+from app.utils.price_store import FLAG_CLOSE_ONLY, frame_to_columns
+
+
+def test_write_load_round_trip(store, provider):
+    columns = frame_to_columns(provider.history('AAA'))
+    header = store.write('AAA', *columns, fetch_time=1000.0)
+
+    series = store.load('AAA')
+    assert len(series) == header.rows == len(columns[0])
+    for stored, written in zip((series.dates, series.open, series.high, series.low, series.close, series.volume),
+                               columns):
+        np.testing.assert_array_equal(stored, written)
+    assert series.dates.dtype == np.int32
+    assert header.last_date == int(columns[0][-1])
+    assert header.last_close == columns[4][-1]
+
+
+def test_header_without_loading_columns(store, provider):
+    store.write_frame('AAA', provider.history('AAA'), fetch_time=1000.0, flags=FLAG_CLOSE_ONLY)
+
+    header = store.header('AAA')
+    assert header.fetch_time == 1000.0
+    assert header.rewrite_time == 1000.0
+    assert header.flags == FLAG_CLOSE_ONLY
+    assert store.header('MISSING') is None
+    assert store.load('MISSING') is None
+
+
+def test_append_replaces_overlap_and_keeps_rewrite_time(store, provider):
+    columns = frame_to_columns(provider.history('AAA'))
+    store.write('AAA', *[column[:-5] for column in columns], fetch_time=1000.0)
+
+    # The overlap starts two rows before the end of the stored series, with a changed last bar
+    new = [column[-7:].copy() for column in columns]
+    new[4][1] += 1.0
+    header = store.append('AAA', *new, fetch_time=2000.0)
+
+    series = store.load('AAA')
+    assert header.rows == len(columns[0])
+    assert header.fetch_time == 2000.0
+    assert header.rewrite_time == 1000.0
+    np.testing.assert_array_equal(series.dates, columns[0])
+    assert series.close[-6] == columns[4][-6] + 1.0
+    np.testing.assert_array_equal(series.close[:-6], columns[4][:-6])
+
+
+def test_index_range(store, provider):
+    store.write_frame('AAA', provider.history('AAA'))
+    series = store.load('AAA')
+    first, last = int(series.dates[0]), int(series.dates[-1])
+
+    assert series.index_range() == (0, len(series))
+    assert series.index_range(first - 10, first - 1) == (0, 0)
+    start, stop = series.index_range(int(series.dates[10]), int(series.dates[20]))
+    assert (start, stop) == (10, 21)
+    assert series.index_range(last + 1) == (len(series), len(series))
+
+
+def test_delete(store, provider):
+    store.write_frame('AAA', provider.history('AAA'))
+    store.record_failure('AAA', 'error', 60, 3600)
+
+    store.delete('AAA')
+    assert store.load('AAA') is None
+    assert store.failure('AAA') is None